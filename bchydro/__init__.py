@@ -1,10 +1,45 @@
 """BCHydro API"""
 
-from bchydro.api import BCHydroApi
-from bchydro.api_simple import BCHydroApiSimple
+import importlib
 
 from bchydro.types import BCHydroRates
 from bchydro.types import BCHydroInterval
 from bchydro.types import BCHydroDailyElectricity
 from bchydro.types import BCHydroDailyUsage
 from bchydro.types import BCHydroAccount
+
+# Clients are imported on first access so that `import bchydro` stays cheap;
+# the headless browser client in particular pulls in pyppeteer.
+_LAZY_ATTRS = {
+    "BCHydroApi": "bchydro.api",
+    "BCHydroApiSimple": "bchydro.api_simple",
+    "BCHydroApiHybrid": "bchydro.api_hybrid",
+    "BCHydroSyncApi": "bchydro.sync",
+    "BCHydroBrowserPool": "bchydro.api_simple",
+}
+
+__all__ = [
+    "BCHydroApi",
+    "BCHydroApiSimple",
+    "BCHydroApiHybrid",
+    "BCHydroSyncApi",
+    "BCHydroBrowserPool",
+    "BCHydroRates",
+    "BCHydroInterval",
+    "BCHydroDailyElectricity",
+    "BCHydroDailyUsage",
+    "BCHydroAccount",
+]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
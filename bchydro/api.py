@@ -1,15 +1,13 @@
-import sys
+import asyncio
 import aiohttp
 import logging
-from datetime import datetime, timedelta
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-from ratelimit import limits
+from concurrent.futures import Executor
+from datetime import date, datetime, time
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
 from tenacity import (
     retry,
     stop_after_attempt,
     retry_if_exception_type,
-    wait_fixed,
     TryAgain,
 )
 
@@ -21,16 +19,42 @@ from .types import (
     BCHydroDailyUsage,
 )
 
+from .parsing import BCHydroConsumptionParser, run_consumption_parser, run_parser
+from .htmlscan import BCHydroPageScan, scan_page
+
+from .cache import BCHydroUsageCache
+from .singleflight import BCHydroSingleFlight
+from .store import BCHydroIntervalStore
+from .session import BCHydroSessionStore, dump_cookies, load_cookies
+from .throttle import BCHydroRateLimiter
+from .metrics import BCHydroMetrics, BCHydroTimedParser, timer
+from .scheduler import BCHydroPoller
+from .delta import BCHydroUsageDelta, diff_usage
+from .query import BCHydroUsageIndex
+from .export import BCHydroExporter
+from . import throttle
+
 from .exceptions import (
     BCHydroAuthException,
-    BCHydroParamException,
-    BCHydroInvalidXmlException,
+    BCHydroSessionExpiredException,
+    BCHydroInvalidHtmlException,
     BCHydroAlertDialogException,
-    BCHydroInvalidDataException,
 )
 
 from .const import (
     FIVE_MINUTES,
+    SESSION_TTL,
+    SESSION_RENEW_MARGIN,
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_ACCOUNT_CONCURRENCY,
+    GRANULARITY_DAILY,
+    GRANULARITY_HOURLY,
+    DATE_RANGE_CURRENT_BILL,
+    DATE_RANGE_CUSTOM,
+    CONNECTION_LIMIT,
+    DNS_CACHE_TTL,
+    KEEPALIVE_TIMEOUT,
+    XML_CHUNK_SIZE,
     USER_AGENT,
     URL_POST_LOGIN,
     URL_LOGIN_GOTO,
@@ -40,81 +64,197 @@ from .const import (
     URL_POST_CONSUMPTION_XML,
 )
 
-log_level = logging.DEBUG if "--debug" in sys.argv else logging.INFO
-logging.basicConfig(level=log_level)
 _LOGGER = logging.getLogger(__name__)
 
 
 class BCHydroApi:
-    def __init__(self, username, password, cache_ttl=FIVE_MINUTES):
-        """Initialize the sensor."""
+    def __init__(
+        self,
+        username,
+        password,
+        cache_ttl=FIVE_MINUTES,
+        connector: aiohttp.BaseConnector = None,
+        cache_size=DEFAULT_CACHE_SIZE,
+        account_id: str = None,
+        store: BCHydroIntervalStore = None,
+        session_store: BCHydroSessionStore = None,
+        login_limiter: BCHydroRateLimiter = None,
+        data_limiter: BCHydroRateLimiter = None,
+        metrics: BCHydroMetrics = None,
+        parse_executor: Executor = None,
+        session_ttl: float = SESSION_TTL,
+    ):
+        """Initialize the sensor.
+
+        A single pooled HTTP session is kept for the life of the instance.
+        Pass a shared `connector` (see `create_connector()`) to pool connections
+        across several instances; a shared connector is not closed by `close()`.
+
+        Usage is cached per (account, granularity, date range) for `cache_ttl`
+        seconds, holding at most `cache_size` results.
+
+        When the login has several accounts, `account_id` picks the one used by
+        `refresh()` and the getters; it defaults to the first listed account.
+
+        With a `store`, every fetched point is persisted and `refresh()` only
+        downloads intervals after the newest stored ACTUAL point, serving the
+        rest of the billing period from the store.
+
+        With a `session_store`, the logged-in session (cookies, bchydroparam and
+        account) is saved after each login and restored on start, so a restarted
+        process skips the login until the portal reports the session expired.
+
+        Logins and data requests wait on `login_limiter` and `data_limiter`.
+        Both default to limiters shared by every instance in the process.
+
+        Phase timings and counters are reported to `metrics` when given, e.g. a
+        `BCHydroPrometheusMetrics`; nothing is measured otherwise.
+
+        With a `parse_executor` (a thread or process pool), login pages and
+        whole consumption responses are parsed on it instead of the event
+        loop. Streaming methods keep parsing chunk by chunk on the loop.
+
+        Sessions are assumed to expire `session_ttl` seconds after login, and
+        are renewed in the background SESSION_RENEW_MARGIN before that while
+        requests carry on with the old session; `None` waits for the portal to
+        report the session expired.
+        """
         self._username = username
         self._password = password
-        self._cookie_jar = None
+        self._connector = connector
+        self._session: aiohttp.ClientSession = None
         self._bchydroparam = None
-        self._cache_ttl = cache_ttl
-        self._cache_expiration_time = None
+        self._account_id = account_id
+        self._account_lock: asyncio.Lock = None
+        self.cache = BCHydroUsageCache(cache_ttl, cache_size)
+        self.store = store
+        self._session_store = session_store
+        self._login_limiter = login_limiter or throttle.login_limiter
+        self._data_limiter = data_limiter or throttle.data_limiter
+        self._flights = BCHydroSingleFlight()
+        self.metrics = metrics
+        self.parse_executor = parse_executor
+        self._pollers: Dict[str, BCHydroPoller] = {}
+        self._auth_generation = 0
+        self.session_ttl = session_ttl
+        # Wall-clock time of the last login, kept with saved sessions
+        self._logged_in_at: float = None
+        self._renewal: asyncio.Future = None
+        self._renewal_timer: asyncio.TimerHandle = None
         self.account: BCHydroAccount = None
+        self.accounts: Dict[str, BCHydroAccount] = {}
         self.usage: BCHydroDailyUsage = None
         self.rates: BCHydroRates = None
         self.latest_point: BCHydroDailyElectricity = None
         self.latest_interval: BCHydroInterval = None
         self.latest_usage: BCHydroDailyUsage = None
         self.latest_cost = None
-
-    def _parse_bchydroparam(self, soup: BeautifulSoup) -> str:
-        """
-        Extract bchydroparam from page HTML for use in the consumption endpoint.
-        The param often appears twice: a hidden <input /> and a <span /> with an id.
-        The <input /> element appears more reliably than the <span /> so we use the input.
-        This seems to be a CSRF token, though it isn't confirmed as such.
-        """
-        span_element = soup.find(id="bchydroparam")
-        if span_element:
-            return span_element.text
-        input_element = soup.find("input", {"name": "bchydroparam"})
-        if input_element:
-            return input_element.get("value")
-        raise BCHydroParamException(
-            "Unable to find bchydroparam; likely failed to login"
+        # Last refresh() result per granularity, to diff the next one against,
+        # and what changed in it; see refresh_delta()
+        self._previous_usage: Dict[str, BCHydroDailyUsage] = {}
+        self._deltas: Dict[str, BCHydroUsageDelta] = {}
+        # Account freshness fields seen before each refresh() fetch, with the
+        # usage that fetch returned; compared against by probing refreshes
+        self._snapshots: Dict[str, Tuple[tuple, BCHydroDailyUsage]] = {}
+        # Built on first use by get_usage_index(), then kept up to date
+        self._indexes: Dict[Tuple[str, str], BCHydroUsageIndex] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @staticmethod
+    def create_connector(**kwargs) -> aiohttp.TCPConnector:
+        """Build a keep-alive connector with DNS caching, suitable for sharing."""
+        kwargs.setdefault("limit", CONNECTION_LIMIT)
+        kwargs.setdefault("ttl_dns_cache", DNS_CACHE_TTL)
+        kwargs.setdefault("keepalive_timeout", KEEPALIVE_TIMEOUT)
+        return aiohttp.TCPConnector(**kwargs)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=self._connector or self.create_connector(),
+                connector_owner=self._connector is None,
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._session
+
+    def _login_session(self) -> aiohttp.ClientSession:
+        """A session with an empty cookie jar, on the same connection pool."""
+        return aiohttp.ClientSession(
+            connector=self._get_session().connector,
+            connector_owner=False,
+            headers={"User-Agent": USER_AGENT},
         )
 
-    def _validate_html_response(self, html) -> BeautifulSoup:
-        soup = None
+    def _adopt_session(self, session: aiohttp.ClientSession, bchydroparam: str):
+        """Replace the main session's cookies and token with a login's."""
+        jar = self._get_session().cookie_jar
+        jar.clear()
+        load_cookies(jar, dump_cookies(session.cookie_jar))
+        self._bchydroparam = bchydroparam
+
+    async def close(self):
+        """Close the HTTP session and, unless it is shared, its connector."""
+        for poller in self._pollers.values():
+            poller.stop()
+        if self._renewal_timer is not None:
+            self._renewal_timer.cancel()
+        if self._renewal is not None:
+            self._renewal.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _validate_html_response(self, html) -> BCHydroPageScan:
         try:
-            soup = BeautifulSoup(html, features="html.parser")
-            self._bchydroparam = self._parse_bchydroparam(soup)
-        except:
-            raise BCHydroInvalidHtmlException()
-
-        return soup
-
-    def _detect_alert_errors(self, soup: BeautifulSoup):
-        try:
-            alert_errors = soup.select(".alert.error:not(.hidden)")
-        except TypeError:
-            raise BCHydroInvalidHtmlException()
-
-        if len(alert_errors):
-            raise BCHydroAlertDialogException(alert_errors[0].text)
-
-    def _bust_cache(self):
-        self._cache_expiration_time = datetime.now() + timedelta(
-            seconds=self._cache_ttl
-        )
-
-    def _is_cache_expired(self):
-        if self._cache_expiration_time is not None:
-            expired = datetime.now() > self._cache_expiration_time
-        else:
-            expired = True
-        return expired
-
-    async def _auth_again_if(self, condition, debug_msg=None):
+            page = await run_parser(self.parse_executor, scan_page, html)
+        except Exception as e:
+            raise BCHydroInvalidHtmlException(e)
+        return page
+
+    def _detect_alert_errors(self, page: BCHydroPageScan):
+        if len(page.alert_errors):
+            raise BCHydroAlertDialogException(page.alert_errors[0])
+
+    def _cache_key(self, granularity, account: BCHydroAccount = None, date_range=None):
+        account = account or self.account
+        start, end = date_range or (account.evpBillingStart, account.evpBillingEnd)
+        return (account.evpAccountId, granularity, start, end)
+
+    @staticmethod
+    def _format_datetime(value) -> str:
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, time())
+        return value.isoformat()
+
+    def _inc(self, name, value=1):
+        if self.metrics is not None:
+            self.metrics.inc(name, value)
+
+    async def _throttle(self, limiter: BCHydroRateLimiter, wait_counter: str):
+        delay = await limiter.acquire()
+        if delay:
+            self._inc(wait_counter, delay)
+
+    def _cache_get(self, key):
+        usage = self.cache.get(key)
+        self._inc("cache_misses" if usage is None else "cache_hits")
+        return usage
+
+    async def _auth_again_if(self, condition, debug_msg=None, generation=None):
         if condition:
             if debug_msg is not None:
                 _LOGGER.debug(debug_msg)
-            await self._authenticate()
+            # Skip the login if another caller already re-authenticated since
+            # this request was sent; its fresh session is good enough.
+            if generation is None or generation == self._auth_generation:
+                self._inc("reauths")
+                await self._authenticate()
+            self._inc("retries")
             raise TryAgain
 
     async def _refresh_if(self, condition, debug_msg=None, hourly=False):
@@ -124,12 +264,99 @@ class BCHydroApi:
 
             await self.refresh(hourly=hourly)
 
-    @limits(calls=3, period=FIVE_MINUTES)
+    async def _ensure_authenticated(self):
+        if self.account:
+            self._renew_if_old()
+            return
+        if self._restore_session():
+            _LOGGER.debug("Restored saved session")
+            return
+        _LOGGER.debug("Performing initial authentication")
+        await self._authenticate()
+
+    def _restore_session(self) -> bool:
+        if self._session_store is None:
+            return False
+        state = self._session_store.load()
+        if not state or state.get("username") != self._username:
+            return False
+
+        session = self._get_session()
+        load_cookies(session.cookie_jar, state["cookies"])
+        self._bchydroparam = state["bchydroparam"]
+        self.account = BCHydroAccount(**state["account"])
+        self.accounts = {self.account.evpAccountId: self.account}
+        self._logged_in_at = state.get("logged_in_at")
+        self._schedule_renewal()
+        return True
+
+    def _session_age(self) -> float:
+        if self._logged_in_at is None:
+            return None
+        return datetime.now().timestamp() - self._logged_in_at
+
+    def _schedule_renewal(self):
+        """Renew the session SESSION_RENEW_MARGIN before it expires, even if
+        no request comes in then."""
+        if self._renewal_timer is not None:
+            self._renewal_timer.cancel()
+        age = self._session_age()
+        if self.session_ttl is None or age is None:
+            return
+        delay = max(self.session_ttl - SESSION_RENEW_MARGIN - age, 0)
+        self._renewal_timer = asyncio.get_event_loop().call_later(
+            delay, self._renew_if_old
+        )
+
+    def _renew_if_old(self):
+        """Start a background login if the session is about to expire."""
+        renewing = self._renewal is not None and not self._renewal.done()
+        if self.session_ttl is None or renewing or "authenticate" in self._flights:
+            return
+        age = self._session_age()
+        if age is None or age < self.session_ttl - SESSION_RENEW_MARGIN:
+            return
+        _LOGGER.debug("Session is %d seconds old, renewing it", age)
+        self._inc("renewals")
+        self._renewal = asyncio.ensure_future(self._renew_session())
+
+    async def _renew_session(self):
+        try:
+            await self._authenticate()
+        except Exception as e:
+            # The next request finds out and logs in the usual way
+            _LOGGER.warning("Renewing the session failed: %s", e)
+
+    def _save_session(self):
+        if self._session_store is None:
+            return
+        self._session_store.save(
+            {
+                "username": self._username,
+                "cookies": dump_cookies(self._get_session().cookie_jar),
+                "bchydroparam": self._bchydroparam,
+                "account": vars(self.account),
+                "logged_in_at": self._logged_in_at,
+            }
+        )
+
     async def _authenticate(self) -> bool:
+        """Log in, sharing one attempt between all concurrent callers."""
+        return await self._flights.do("authenticate", self._timed_login)
+
+    async def _timed_login(self) -> bool:
+        self._inc("logins")
+        with timer(self.metrics, "login"):
+            return await self._login()
+
+    async def _login(self) -> bool:
+        await self._throttle(self._login_limiter, "login_wait_seconds")
         _LOGGER.debug("authenticating with username: %s", self._username)
 
-        async with aiohttp.ClientSession(headers={"User-Agent": USER_AGENT}) as session:
-            response = await session.post(
+        # Logins run on their own session, so that requests sent meanwhile
+        # keep using the current cookies until the new ones are ready
+        async with self._login_session() as session:
+            async with session.post(
                 URL_POST_LOGIN,
                 data={
                     "realm": "bch-ps",
@@ -137,193 +364,566 @@ class BCHydroApi:
                     "password": self._password,
                     "gotoUrl": URL_LOGIN_GOTO,
                 },
-            )
-            if response.status != 200:
-                raise BCHydroAuthException()
-
-            self._cookie_jar = session.cookie_jar
-            page_html = await response.text()
-            soup = self._validate_html_response(page_html)
-
-            # If the user has multiple accounts (eg. after a move), pick the first open one
-            # todo: allow user to specify
-            account_list_divs = soup.find_all("div", class_="accountListDiv")
-            if len(account_list_divs) > 0:
-                accounts_response = await session.post(
-                    URL_GET_ACCOUNTS, headers={"x-csrf-token": self._bchydroparam}
-                )
-                accounts = await accounts_response.json()
-                account_id = accounts["accounts"][0]["accountId"]
-                response = await session.get(
-                    URL_ACCOUNTS_OVERVIEW + "?aid=" + account_id
-                )
+            ) as response:
+                if response.status != 200:
+                    raise BCHydroAuthException()
                 page_html = await response.text()
-                self._validate_html_response(page_html)
 
-            self._detect_alert_errors(soup)
+            page = await self._validate_html_response(page_html)
+            return await self._finish_login(session, page)
+
+    async def _finish_login(self, session, page: BCHydroPageScan) -> bool:
+        """Select the account and load its details on a freshly logged-in
+        session, then make it the main session."""
+        bchydroparam = page.bchydroparam
+        # If the user has multiple accounts (eg. after a move), pick the requested
+        # one or else the first open one
+        if page.has_account_list:
+            account_id = self._account_id
+            if account_id is None:
+                accounts = await self._get_accounts(session, bchydroparam)
+                account_id = accounts[0]["accountId"]
+            bchydroparam = await self._open_account(session, account_id)
+
+        self._detect_alert_errors(page)
+
+        account = await self._fetch_account_json(session)
+        # Not while _load_accounts() is switching accounts on the current session
+        async with self._get_account_lock():
+            self._adopt_session(session, bchydroparam)
+            self.account = account
+            # Snapshots of other accounts belong to the previous session
+            self.accounts = {self.account.evpAccountId: self.account}
+
+            self._auth_generation += 1
+            self._logged_in_at = datetime.now().timestamp()
+            self._save_session()
+            self._schedule_renewal()
+        return True
+
+    async def _get_accounts(self, session, bchydroparam) -> List[dict]:
+        await self._throttle(self._data_limiter, "data_wait_seconds")
+        async with session.post(
+            URL_GET_ACCOUNTS, headers={"x-csrf-token": bchydroparam}
+        ) as response:
+            accounts = await response.json()
+        return accounts["accounts"]
+
+    async def _open_account(self, session, account_id) -> str:
+        """Make `account_id` the portal's current account for this session.
+
+        Returns the bchydroparam token of the page that lands on.
+        """
+        await self._throttle(self._data_limiter, "data_wait_seconds")
+        async with session.get(
+            URL_ACCOUNTS_OVERVIEW + "?aid=" + account_id
+        ) as response:
+            page_html = await response.text()
+        page = await self._validate_html_response(page_html)
+        return page.bchydroparam
+
+    async def _fetch_account_json(
+        self, session, follow_redirects=True
+    ) -> BCHydroAccount:
+        """Account details; without `follow_redirects`, a redirect to the
+        login page raises BCHydroSessionExpiredException."""
+        await self._throttle(self._data_limiter, "data_wait_seconds")
+        with timer(self.metrics, "account"):
+            async with session.get(
+                URL_GET_ACCOUNT_JSON, allow_redirects=follow_redirects
+            ) as response:
+                if 300 <= response.status < 400:
+                    # Sent to the login page; no need to download it
+                    raise BCHydroSessionExpiredException()
+                try:
+                    return BCHydroAccount.from_json(await response.json())
+                except Exception as e:
+                    _LOGGER.debug("Auth response text: %s", await response.text())
+                    raise BCHydroAuthException(e)
+
+    async def list_accounts(self) -> List[dict]:
+        """Accounts visible to this login, as listed by the portal."""
+        await self._ensure_authenticated()
 
+        try:
+            return await self._get_accounts(self._get_session(), self._bchydroparam)
+        except (aiohttp.ClientError, KeyError, ValueError) as e:
+            # Single-account logins never see the account list page
+            _LOGGER.debug("Unable to list accounts, using current one: %s", e)
+            return [{"accountId": self.account.evpAccountId}]
+
+    def _get_account_lock(self) -> asyncio.Lock:
+        if self._account_lock is None:
+            self._account_lock = asyncio.Lock()
+        return self._account_lock
+
+    async def _load_accounts(self, account_ids: Iterable[str]) -> List[BCHydroAccount]:
+        """Snapshot account details, switching the portal to each one in turn.
+
+        Switching accounts changes session-wide state, so it is serialized
+        (logins included) and the current account is selected again
+        afterwards, even if a switch fails.
+        """
+        async with self._get_account_lock():
+            session = self._get_session()
+            loaded = {a: self.accounts[a] for a in account_ids if a in self.accounts}
+            missing = [a for a in account_ids if a not in loaded]
             try:
-                response = await session.get(URL_GET_ACCOUNT_JSON)
-                json_res = await response.json()
-
-                self.account = BCHydroAccount(
-                    json_res["evpSlid"],
-                    json_res["evpAccount"],
-                    json_res["evpAccountId"],
-                    json_res["evpProfileId"],
-                    json_res["evpRateGroup"],
-                    json_res["evpBillingStart"],
-                    json_res["evpBillingEnd"],
-                    json_res["evpConsToDate"],
-                    json_res["evpCostToDate"],
-                    json_res["yesterdayPercentage"],
-                    json_res["evpEstConsCurPeriod"],
-                    json_res["evpEstCostCurPeriod"],
-                    json_res["evpCurrentDateTime"],
-                )
-
-            except Exception as e:
-                _LOGGER.debug("Auth response text: %s", await response.text())
-                raise BCHydroAuthException(e)
+                for account_id in missing:
+                    self._bchydroparam = await self._open_account(session, account_id)
+                    loaded[account_id] = await self._fetch_account_json(session)
+            finally:
+                if missing:
+                    self._bchydroparam = await self._open_account(
+                        session, self.account.evpAccountId
+                    )
+            self.accounts.update(loaded)
 
-        return True
+        return [loaded[a] for a in account_ids]
 
-    @retry(
-        stop=stop_after_attempt(2),
-        wait=wait_fixed(1),
-        retry=retry_if_exception_type(TryAgain),
-    )
-    async def refresh(self, hourly=False) -> BCHydroDailyUsage:
-        if not self._is_cache_expired():
-            _LOGGER.debug("Returning cached usage")
-            return self.usage
-
-        if not self.account:
-            _LOGGER.debug("Performing initial authentication")
-            await self._authenticate()
+    async def refresh_accounts(
+        self,
+        account_ids: Iterable[str] = None,
+        hourly=False,
+        concurrency=DEFAULT_ACCOUNT_CONCURRENCY,
+    ) -> Dict[str, BCHydroDailyUsage]:
+        """Refresh several accounts concurrently over the one logged-in session.
 
-        async with aiohttp.ClientSession(
-            cookie_jar=self._cookie_jar, headers={"User-Agent": USER_AGENT}
-        ) as session:
-            response = await session.post(
-                URL_POST_CONSUMPTION_XML,
-                data={
-                    "Slid": self.account.evpSlid,
-                    "Account": self.account.evpAccount,
-                    "ChartType": "column",
-                    "Granularity": hourly and "hourly" or "daily",
-                    "Overlays": "none",
-                    "DateRange": "currentBill",
-                    "StartDateTime": self.account.evpBillingStart,
-                    "EndDateTime": self.account.evpBillingEnd,
-                    "RateGroup": self.account.evpRateGroup,
-                },
-                headers={"bchydroparam": self._bchydroparam},
+        Defaults to every account from `list_accounts()`. At most `concurrency`
+        consumption requests are in flight at once. Results share the usage
+        cache with `refresh()`, and are returned keyed by account id.
+        """
+        await self._ensure_authenticated()
+
+        if account_ids is None:
+            account_ids = [a["accountId"] for a in await self.list_accounts()]
+        account_ids = list(account_ids)
+        accounts = await self._load_accounts(account_ids)
+
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def refresh_account(account):
+            key = self._cache_key(granularity, account)
+            usage = self._cache_get(key)
+            if usage is None:
+                async with semaphore:
+                    usage = await self._flights.do(
+                        key, self._fetch_and_cache, granularity, account
+                    )
+            return usage
+
+        usages = await asyncio.gather(*(refresh_account(a) for a in accounts))
+        return dict(zip(account_ids, usages))
+
+    async def fetch_range(
+        self,
+        start: date,
+        end: date,
+        hourly=False,
+        account_id: str = None,
+        use_cache=True,
+    ) -> BCHydroDailyUsage:
+        """Fetch usage for an arbitrary [start, end) range.
+
+        `start` and `end` are dates or datetimes. The portal caps how long a
+        range may be (see `MAX_RANGE_DAYS`); use `BCHydroBackfill` for longer
+        histories. Pass `use_cache=False` to bypass the usage cache entirely.
+        """
+        await self._ensure_authenticated()
+
+        account = None
+        if account_id is not None and account_id != self.account.evpAccountId:
+            account = (await self._load_accounts([account_id]))[0]
+
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        date_range = (self._format_datetime(start), self._format_datetime(end))
+        if not use_cache:
+            return await self._fetch_usage(granularity, account, date_range)
+
+        key = self._cache_key(granularity, account, date_range)
+        usage = self._cache_get(key)
+        if usage is None:
+            usage = await self._flights.do(
+                key, self._fetch_and_cache, granularity, account, date_range
             )
+        return usage
+
+    async def refresh(self, hourly=False, probe=False) -> BCHydroDailyUsage:
+        """Fetch the current billing period's usage, from the cache if fresh.
 
+        With `probe`, the small account JSON is requested first, updating
+        `account` in place. If its data timestamp and to-date totals are the
+        same as before the previous fetch, the previous result is reused
+        without downloading consumption; otherwise the cache is bypassed.
+        """
+        usage, _ = await self._refresh(hourly, probe)
+        return usage
+
+    async def refresh_delta(self, hourly=False, probe=False) -> BCHydroUsageDelta:
+        """Refresh like `refresh()`, returning what changed in the result.
+
+        The delta is worked out once, when a result first reaches this
+        client, against the result before it. Callers sharing that fetch, and
+        later cache hits or skipped probes returning the same result, get the
+        same delta again, so writers should apply it idempotently (upserts).
+        """
+        _, delta = await self._refresh(hourly, probe)
+        return delta
+
+    async def _refresh(
+        self, hourly, probe
+    ) -> Tuple[BCHydroDailyUsage, BCHydroUsageDelta]:
+        await self._ensure_authenticated()
+
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        if probe and await self._flights.do(
+            ("probe", granularity), self._probe_unchanged, granularity
+        ):
+            _LOGGER.debug("No new %s usage published, skipping download", granularity)
+            usage = self._previous_usage[granularity]
+        else:
+            key = self._cache_key(granularity)
+            usage = self._cache_get(key)
+            if usage is not None:
+                _LOGGER.debug("Returning cached %s usage", granularity)
+            else:
+                # Concurrent callers for the same key share one upstream fetch
+                usage = await self._flights.do(key, self._fetch_and_cache, granularity)
+
+        if usage is not self._previous_usage.get(granularity):
+            # Cached by refresh_accounts() rather than fetched by a refresh
+            self._record_usage(granularity, usage)
+        delta = self._deltas[granularity]
+        self._set_usage(usage)
+        self._set_latest(delta.latest_point)
+        return usage, delta
+
+    def _record_usage(self, granularity, usage: BCHydroDailyUsage):
+        """Diff a new current-period result against the previous one."""
+        delta = diff_usage(
+            self._previous_usage.get(granularity), usage, self._is_valid_point
+        )
+        self._previous_usage[granularity] = usage
+        self._deltas[granularity] = delta
+        self._update_index(granularity, usage, delta)
+
+    @staticmethod
+    def _freshness(account: BCHydroAccount) -> tuple:
+        """Account fields that move whenever the portal publishes new usage."""
+        return (
+            account.evpAccountId,
+            account.evpBillingStart,
+            account.evpBillingEnd,
+            account.evpCurrentDateTime,
+            account.evpConsToDate,
+            account.evpCostToDate,
+        )
+
+    async def _probe_unchanged(self, granularity) -> bool:
+        """Fetch the account JSON; True if no usage was published since."""
+        previous = self._previous_usage.get(granularity)
+        snapshot, usage = self._snapshots.get(granularity, (None, None))
+        if previous is None or usage is not previous:
+            return False
+
+        try:
+            latest = await self._fetch_account_json(
+                self._get_session(), follow_redirects=False
+            )
+        except BCHydroSessionExpiredException:
+            _LOGGER.debug("Session expired while probing, re-authenticating")
+            self._inc("reauths")
+            await self._authenticate()
+            return False
+        if latest.evpAccountId != self.account.evpAccountId:
+            # The portal switched accounts under us; fetch the usual way
+            return False
+
+        if latest.evpBillingStart == self.account.evpBillingStart:
+            self.account.update(latest)
+        else:
+            # Keep the old period's account on the usage diffed against
+            self.account = self.accounts[latest.evpAccountId] = latest
+        if self._freshness(self.account) == snapshot:
+            self._inc("probe_skips")
+            return True
+        # A cached result may predate what was just published
+        self.cache.invalidate(self._cache_key(granularity))
+        return False
+
+    async def _fetch_and_cache(
+        self,
+        granularity,
+        account: BCHydroAccount = None,
+        date_range: Tuple[str, str] = None,
+    ) -> BCHydroDailyUsage:
+        current = account is None and date_range is None
+        # Taken before the request so that a later probe errs towards fetching
+        snapshot = self._freshness(self.account) if current else None
+        with timer(self.metrics, "fetch"):
+            if self.store is not None and date_range is None:
+                usage = await self._fetch_incremental(granularity, account)
+            else:
+                usage = await self._fetch_usage(granularity, account, date_range)
+        if current:
+            self._snapshots[granularity] = (snapshot, usage)
+            self._record_usage(granularity, usage)
+        # Re-authentication may have rolled the billing period over
+        self.cache.set(self._cache_key(granularity, account, date_range), usage)
+        return usage
+
+    async def _fetch_incremental(
+        self, granularity, account: BCHydroAccount = None
+    ) -> BCHydroDailyUsage:
+        """Fetch the billing period, downloading only what the store lacks."""
+        account = account or self.account
+        newest = self.store.newest_actual(
+            account.evpAccountId, granularity, since=account.evpBillingStart
+        )
+        if newest is None:
+            return await self._fetch_usage(granularity, account)
+
+        _LOGGER.debug("Fetching %s usage after %s", granularity, newest.interval.end)
+        date_range = (newest.interval.end, account.evpBillingEnd)
+        usage = await self._fetch_usage(granularity, account, date_range)
+        usage.electricity = self.store.points(
+            account.evpAccountId,
+            granularity,
+            account.evpBillingStart,
+            account.evpBillingEnd,
+        )
+        return usage
+
+    @retry(stop=stop_after_attempt(2), retry=retry_if_exception_type(TryAgain))
+    async def _post_consumption(
+        self,
+        granularity,
+        account: BCHydroAccount = None,
+        date_range: Tuple[str, str] = None,
+    ) -> aiohttp.ClientResponse:
+        """Send the consumption request; the caller reads and releases the body.
+
+        Without a `date_range` the account's current billing period is used.
+        An expired session is recognised from the redirect to the login page,
+        which is not followed, and the request is sent again straight after
+        logging in.
+        """
+        generation = self._auth_generation
+        account = account or self.account
+        if date_range is None:
+            range_type = DATE_RANGE_CURRENT_BILL
+            start, end = account.evpBillingStart, account.evpBillingEnd
+        else:
+            range_type = DATE_RANGE_CUSTOM
+            start, end = date_range
+
+        await self._throttle(self._data_limiter, "data_wait_seconds")
+        session = self._get_session()
+        response = await session.post(
+            URL_POST_CONSUMPTION_XML,
+            data={
+                "Slid": account.evpSlid,
+                "Account": account.evpAccount,
+                "ChartType": "column",
+                "Granularity": granularity,
+                "Overlays": "none",
+                "DateRange": range_type,
+                "StartDateTime": start,
+                "EndDateTime": end,
+                "RateGroup": account.evpRateGroup,
+            },
+            headers={"bchydroparam": self._bchydroparam},
+            allow_redirects=False,
+        )
+
+        try:
             await self._auth_again_if(
-                condition=str(response.url) != str(URL_POST_CONSUMPTION_XML),
-                debug_msg="Unexpected XML URL, has session expired?",
+                condition=300 <= response.status < 400,
+                debug_msg="Consumption request redirected, has session expired?",
+                generation=generation,
             )
 
+            content_type = response.headers.get("content-type", "")
             await self._auth_again_if(
-                condition="application/xml" not in response.headers["content-type"],
+                condition="application/xml" not in content_type,
                 debug_msg="Unexpected XML content-type, has session expired?",
+                generation=generation,
+            )
+        except BaseException:
+            response.release()
+            raise
+
+        return response
+
+    async def _iter_points(
+        self,
+        granularity,
+        parser: BCHydroConsumptionParser = None,
+        account: BCHydroAccount = None,
+        date_range: Tuple[str, str] = None,
+    ) -> AsyncIterator[BCHydroDailyElectricity]:
+        parser = parser or BCHydroConsumptionParser()
+        response = await self._post_consumption(granularity, account, date_range)
+        if self.metrics is not None:
+            parser = BCHydroTimedParser(parser, self.metrics)
+        async with response:
+            async for chunk in response.content.iter_chunked(XML_CHUNK_SIZE):
+                for point in parser.feed(chunk):
+                    yield point
+            for point in parser.close():
+                yield point
+        if self.metrics is not None:
+            parser.report()
+
+    async def _fetch_usage(
+        self,
+        granularity,
+        account: BCHydroAccount = None,
+        date_range: Tuple[str, str] = None,
+    ) -> BCHydroDailyUsage:
+        if self.parse_executor is None:
+            parser = BCHydroConsumptionParser()
+            points = self._iter_points(granularity, parser, account, date_range)
+            new_usage = [point async for point in points]
+            rates = parser.rates
+        else:
+            new_usage, rates = await self._parse_offloaded(
+                granularity, account, date_range
             )
 
-            try:
-                text = await response.text()
-                root = ET.fromstring(text)
-            except ET.ParseError as e:
-                raise BCHydroInvalidXmlException(e)
+        account = account or self.account
+        if self.store is not None:
+            self.store.upsert(account.evpAccountId, granularity, new_usage)
+        return BCHydroDailyUsage(electricity=new_usage, rates=rates, account=account)
+
+    async def _parse_offloaded(
+        self,
+        granularity,
+        account: BCHydroAccount = None,
+        date_range: Tuple[str, str] = None,
+    ) -> Tuple[List[BCHydroDailyElectricity], BCHydroRates]:
+        """Read the whole response, then parse it on the parse executor."""
+        response = await self._post_consumption(granularity, account, date_range)
+        async with response:
+            with timer(self.metrics, "download"):
+                body = await response.read()
+        self._inc("bytes_received", len(body))
+        with timer(self.metrics, "parse"):
+            return await run_consumption_parser(self.parse_executor, body)
+
+    async def stream_usage(
+        self, hourly=False
+    ) -> AsyncIterator[BCHydroDailyElectricity]:
+        """Yield current billing period points as the response is parsed.
+
+        Nothing is buffered or cached, so memory use does not grow with the
+        size of the date range. `self.rates` is updated once the stream ends.
+        """
+        await self._ensure_authenticated()
 
-            new_usage: BCHydroDailyUsage = []
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        parser = BCHydroConsumptionParser()
+        async for point in self._iter_points(granularity, parser):
+            yield point
 
-            try:
-                for point in root.findall("Series")[0].findall("Point"):
-                    # For now we're hard-filtering ACTUAL datapoints.
-                    # It might be worth looking into ESTIMATED points...
-                    # This renders self._is_valid_point() redundant.
-                    if point.get("quality") != "ACTUAL":
-                        continue
-
-                    interval = BCHydroInterval(
-                        point.get("dateTime"), point.get("endTime")
-                    )
+        self.rates = parser.rates
 
-                    new_usage.append(
-                        BCHydroDailyElectricity(
-                            type=point.get("type"),
-                            quality=point.get("quality"),
-                            consumption=point.get("value"),
-                            interval=interval,
-                            cost=point.get("cost"),
-                        )
-                    )
+    async def export_usage(self, exporter: BCHydroExporter, hourly=False) -> int:
+        """Stream the current billing period into `exporter`, then flush it.
 
-                rates = root.find("Rates")
-            except Exception as e:
-                raise BCHydroInvalidDataException(e)
+        Points go from the parser to the exporter's batches without building a
+        `BCHydroDailyUsage`. Returns the number of points exported.
+        """
+        return await exporter.consume(self.stream_usage(hourly=hourly))
 
-            self.rates = BCHydroRates(
-                rates.get("daysSince"),
-                rates.get("cons2date"),
-                rates.get("cost2date"),
-                rates.get("estCons"),
-                rates.get("estCost"),
-            )
+    def subscribe(self, hourly=False) -> AsyncIterator[BCHydroDailyElectricity]:
+        """Yield new ACTUAL points as background polls find them.
 
-            usage = BCHydroDailyUsage(
-                electricity=new_usage, rates=self.rates, account=self.account
-            )
+        Subscribers with the same granularity share one `BCHydroPoller`, so
+        the portal is polled once however many are listening. Polling stops
+        when the last subscriber leaves. Construct a `BCHydroPoller` directly
+        to tune its intervals.
+        """
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        poller = self._pollers.get(granularity)
+        if poller is None:
+            poller = self._pollers[granularity] = BCHydroPoller(self, hourly)
+        return poller.subscribe()
+
+    async def get_usage_frame(self, hourly=False):
+        """Fetch the current billing period straight into a BCHydroUsageFrame.
+
+        Rows are collected from the parser without building point objects.
+        Requires the numpy extra.
+        """
+        from .frame import BCHydroUsageFrame
 
-            self._bust_cache()
-            self._set_usage(usage)
-            self._set_latest_point(usage)
-            self._set_latest_interval(usage)
-            self._set_latest_usage(usage)
-            self._set_latest_cost(usage)
+        await self._ensure_authenticated()
 
-        return self.usage
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        parser = BCHydroConsumptionParser(
+            point_factory=BCHydroUsageFrame.row_from_attrib
+        )
+        rows = [row async for row in self._iter_points(granularity, parser)]
+        self.rates = parser.rates
+        return BCHydroUsageFrame.from_rows(rows)
 
     def _is_valid_point(self, point):
         return point.quality == "ACTUAL"
 
+    def _index_key(self, granularity, usage: BCHydroDailyUsage = None):
+        account = usage.account if usage is not None else self.account
+        return (account.evpAccountId if account else None, granularity)
+
+    def _update_index(self, granularity, usage, delta: BCHydroUsageDelta):
+        index = self._indexes.get(self._index_key(granularity, usage))
+        if index is not None and delta:
+            index.add(usage.electricity if delta.reset else delta.changed)
+
+    async def get_usage_index(self, hourly=False) -> BCHydroUsageIndex:
+        """Sorted, aggregated index over the current account's usage.
+
+        The index is built from the latest refresh on first call, then fed
+        every later refresh's delta, so it accumulates history across billing
+        periods.
+        """
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        usage = self._previous_usage.get(granularity)
+        if usage is None or usage.account is not self.account:
+            usage = await self.refresh(hourly=hourly)
+
+        key = self._index_key(granularity, usage)
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = BCHydroUsageIndex.from_usage(usage)
+        return index
+
     def _set_usage(self, usage):
         self.usage = usage
+        self.rates = usage.rates
 
     async def get_usage(self, hourly=False) -> BCHydroDailyUsage:
-        await self._refresh_if(not self.usage, hourly=hourly)
-        return self.usage
+        return await self.refresh(hourly=hourly)
 
-    def _set_latest_point(self, usage):
-        valid_point = list(filter(self._is_valid_point, self.usage.electricity))
-        self.latest_point = valid_point[-1] if len(valid_point) else None
+    def _set_latest(self, point: BCHydroDailyElectricity):
+        self.latest_point = point
+        self.latest_interval = point.interval if point else None
+        self.latest_usage = point.consumption if point else None
+        self.latest_cost = point.cost if point else None
 
     async def get_latest_point(self) -> BCHydroDailyElectricity:
         await self._refresh_if(not self.latest_point)
         return self.latest_point
 
-    def _set_latest_interval(self, usage):
-        valid_point = list(filter(self._is_valid_point, self.usage.electricity))
-        self.latest_interval = valid_point[-1].interval if len(valid_point) else None
-
     async def get_latest_interval(self) -> BCHydroInterval:
         await self._refresh_if(not self.latest_interval)
         return self.latest_interval
 
-    def _set_latest_usage(self, usage):
-        valid_point = list(filter(self._is_valid_point, self.usage.electricity))
-        self.latest_usage = valid_point[-1].consumption if len(valid_point) else None
-
     async def get_latest_usage(self):
         await self._refresh_if(not self.latest_usage)
         return self.latest_usage
 
-    def _set_latest_cost(self, usage):
-        valid_point = list(filter(self._is_valid_point, self.usage.electricity))
-        self.latest_cost = valid_point[-1].cost if len(valid_point) else None
-
     async def get_latest_cost(self):
         await self._refresh_if(not self.latest_cost)
         return self.latest_cost
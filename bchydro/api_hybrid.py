@@ -0,0 +1,44 @@
+import logging
+
+from typing import Optional
+
+from .api import BCHydroApi
+from .api_simple import BCHydroApiSimple
+from .session import load_cookies
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BCHydroApiHybrid(BCHydroApi):
+    def __init__(
+        self,
+        username,
+        password,
+        browser_exec_path: Optional[str] = None,
+        debug: bool = False,
+        **kwargs,
+    ):
+        """BCHydroApi that logs in through the headless browser.
+
+        Each login runs once in `BCHydroApiSimple`, whose cookies and
+        bchydroparam token are handed to the aiohttp session before the browser
+        is closed. All data requests then go through plain HTTP. When the
+        portal reports the session expired, the usual re-authentication path
+        logs in with the browser again.
+
+        Other keyword arguments are passed to `BCHydroApi`.
+        """
+        super().__init__(username, password, **kwargs)
+        self._browser_client = BCHydroApiSimple(
+            username, password, browser_exec_path=browser_exec_path, debug=debug
+        )
+
+    async def _login(self) -> bool:
+        await self._throttle(self._login_limiter, "login_wait_seconds")
+        _LOGGER.debug("authenticating through browser as: %s", self._username)
+        exported = await self._browser_client.export_session(throttled=False)
+
+        async with self._login_session() as session:
+            load_cookies(session.cookie_jar, exported["cookies"])
+            page = await self._validate_html_response(exported["page_html"])
+            return await self._finish_login(session, page)
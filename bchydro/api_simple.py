@@ -1,15 +1,24 @@
 import asyncio
 import logging
 import os
+import weakref
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
+from urllib.parse import parse_qsl, urlencode
 
-from bs4 import BeautifulSoup
-from pyppeteer import launch
-
+from . import throttle
+from .parsing import run_consumption_parser, run_parser
+from .session import cookies_from_browser
+from .types import BCHydroDailyUsage
 
 from .const import (
     URL_LOGIN_PAGE,
+    URL_POST_CONSUMPTION_XML,
+    BLOCKED_RESOURCE_TYPES,
+    GRANULARITY_DAILY,
+    GRANULARITY_HOURLY,
     ENUM_LAST_7_DAYS,
     ENUM_CURRENT_BILLING_PERIOD,
     ENUM_LAST_BILLING_PERIOD,
@@ -28,9 +37,323 @@ supported_periods = (
 )
 
 
+async def _launch_browser(browser_exec_path, debug=False):
+    from pyppeteer import launch
+
+    return await launch(
+        slowMo=debug,
+        autoclose=True,
+        devtools=False,
+        executablePath=browser_exec_path,
+    )
+
+
+# Request interceptors installed on each page, see _intercept()
+_interceptors = weakref.WeakKeyDictionary()
+
+
+def _set_form_field(post_data: str, key: str, value: str) -> str:
+    fields = [
+        (k, value if k == key else v)
+        for k, v in parse_qsl(post_data, keep_blank_values=True)
+    ]
+    return urlencode(fields)
+
+
+class _ConsumptionInterceptor:
+    def __init__(self, page, block_resources=True):
+        """Blocks heavy resources and can rewrite the consumption request."""
+        self.page = page
+        self.block_resources = block_resources
+        self.granularity = None
+
+    async def install(self):
+        await self.page.setRequestInterception(True)
+        self.page.on(
+            "request", lambda request: asyncio.ensure_future(self._handle(request))
+        )
+
+    def _rewrites(self, request) -> bool:
+        if not self.granularity or not request.postData:
+            return False
+        return request.url.startswith(URL_POST_CONSUMPTION_XML)
+
+    async def _handle(self, request):
+        if self.block_resources and request.resourceType in BLOCKED_RESOURCE_TYPES:
+            await request.abort()
+        elif self._rewrites(request):
+            post_data = _set_form_field(
+                request.postData, "Granularity", self.granularity
+            )
+            await request.continue_({"postData": post_data})
+        else:
+            await request.continue_()
+
+
+async def _intercept(page, block_resources=True):
+    interceptor = _ConsumptionInterceptor(page, block_resources)
+    await interceptor.install()
+    _interceptors[page] = interceptor
+
+
+async def _capture_consumption(page, granularity, trigger) -> str:
+    """Run `trigger` and return the consumption XML the page fetches."""
+    interceptor = _interceptors.get(page)
+    if interceptor is not None:
+        interceptor.granularity = granularity
+    try:
+        response, _ = await asyncio.gather(
+            page.waitForResponse(lambda r: r.url.startswith(URL_POST_CONSUMPTION_XML)),
+            trigger(),
+        )
+        return await response.text()
+    finally:
+        if interceptor is not None:
+            interceptor.granularity = None
+
+
+async def _log_in(page, username, password, throttled=True):
+    # Browser logins count against the same portal budget as the HTTP client,
+    # unless the caller has already waited on a login limiter
+    if throttled:
+        await throttle.login_limiter.acquire()
+
+    logger.debug("Populating login form...")
+    await page.goto(URL_LOGIN_PAGE)
+    await page.waitForSelector("#email")
+    await page.type("#email", username)
+    await page.type("#password", password)
+
+    logger.debug("Clicking login button...")
+    await asyncio.gather(
+        page.waitForNavigation(),
+        page.click("#submit-button"),
+    )
+
+
+async def _show_consumption_table(page, debug=False):
+    # Navigate to Consumption page by clicking button:
+    logger.debug("Clicking Detailed Consumption button...")
+    await page.waitForSelector("#detailCon:not([disabled])")
+    await asyncio.gather(
+        page.waitForNavigation(),
+        page.click("#detailCon"),
+    )
+
+    if debug:
+        await page.screenshot({"path": "s_clickConsumption.png"})
+
+    await _show_table_view(page, debug)
+
+
+async def _show_table_view(page, debug=False):
+    # Navigate to the table look
+    logger.debug("Clicking Table button...")
+    await page.waitForSelector("#tableBtnLabel")
+    await page.click("#tableBtnLabel")
+
+    if debug:
+        await page.screenshot({"path": "s_afterBtn.png"})
+
+    # Wait until the table with id="consumptionTable" is present
+    await page.waitForSelector("table#consumptionTable")
+
+
+async def _select_period(page, period):
+    await page.waitForSelector("span#dateSelect-button")
+    await page.click("span#dateSelect-button")
+
+    # Wait until the dropdown is present
+    await page.waitForSelector("div.ui-menu-item-wrapper")
+    options = await page.querySelectorAll("div.ui-menu-item-wrapper")
+    for option in options:
+        text = await page.evaluate("(el) => el.textContent", option)
+        if text == period:
+            await option.click()
+            break
+
+    # Wait until the table with id="consumptionTable" is present after changing the table
+    await page.waitForSelector("table#consumptionTable")
+
+
+def _parse_consumption_table(html_table: str) -> dict:
+    """Parse the consumption table from the HTML content.
+
+    Converts <table>...</table> HTML content to a dictionary.
+    It's expected that the table is a daily consumption with the day in the 'Date' column.
+    Parsing converts Date into the key (`YYYY-MM-dd`) for the dictionary, and all columns are flatten into the dictionary per row.
+
+    Args:
+        html_table (str): HTML content of the table, i.e. <table>...</table>
+
+    Returns:
+        dict: Dictionary with the table data, where the keys are the date in short-ISO format (2024-09-01).
+
+    """
+    from bs4 import BeautifulSoup
+
+    # Parse the HTML content using BeautifulSoup
+    soup = BeautifulSoup(html_table, "html.parser")
+
+    # Find the table element
+    table = soup.find("table")
+
+    # Extract table rows
+    rows = table.find_all("tr")
+
+    # Initialize the dictionary to store the table data
+    table_dict = {}
+
+    # Extract the header row to get the field names
+    headers = [header.get_text(strip=True) for header in rows[0].find_all(["td", "th"])]
+
+    # Iterate over the rows and populate the dictionary
+    for row in rows[1:]:  # Skip the header row
+        cells = row.find_all(["td", "th"])
+        cell_data = [cell.get_text(strip=True) for cell in cells]
+        row_dict = dict(zip(headers, cell_data))
+
+        date_key = row_dict.get("Date")
+        if date_key:
+            date_obj = datetime.strptime(date_key, "%b %d, %Y")
+            formatted_date = date_obj.strftime("%Y-%m-%d")
+            row_dict["Date"] = formatted_date
+            table_dict[formatted_date] = row_dict
+
+    return table_dict
+
+
+async def _close_quietly(context):
+    try:
+        await context.close()
+    except Exception as e:
+        logger.debug("Unable to close browser context: %s", e)
+
+
+class BCHydroBrowserPool:
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        size: int = 2,
+        browser_exec_path: Optional[str] = None,
+        debug: bool = False,
+        block_resources: bool = True,
+    ):
+        """Warm, logged-in browser contexts shared by BCHydroApiSimple clients.
+
+        One browser is launched with `size` incognito contexts, each logged in
+        and parked on the consumption table. Callers lease a page with
+        `async with pool.lease() as page:`; pages that fail while leased are
+        replaced with freshly logged-in ones.
+
+        Args:
+            username (str): BCHydro username
+            password (str): BCHydro password
+            size (int): Number of logged-in contexts to keep warm.
+            browser_exec_path (str): Path to browser executable.
+            debug (bool): Slow the browser down and save screenshots.
+            block_resources (bool): Skip loading images, fonts and stylesheets.
+
+        """
+        self._username = username
+        self._password = password
+        self.size = size
+        self.browser_exec_path = browser_exec_path
+        self.debug = debug
+        self.block_resources = block_resources
+        self._browser = None
+        self._idle: asyncio.Queue = None
+        self._dirty = set()
+        self._start_lock: asyncio.Lock = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._browser is not None:
+                return
+            self._browser = await _launch_browser(self.browser_exec_path, self.debug)
+            try:
+                pages = await asyncio.gather(
+                    *(self._new_page() for _ in range(self.size))
+                )
+            except BaseException:
+                # Leave the pool unstarted so the next lease tries again
+                await self.close()
+                raise
+            self._idle = asyncio.Queue()
+            for page in pages:
+                self._idle.put_nowait(page)
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+        self._browser = None
+        self._idle = None
+
+    async def _new_page(self):
+        context = await self._browser.createIncognitoBrowserContext()
+        try:
+            page = await context.newPage()
+            await _intercept(page, self.block_resources)
+            await _log_in(page, self._username, self._password)
+            await _show_consumption_table(page, self.debug)
+        except BaseException:
+            await _close_quietly(context)
+            raise
+        return page
+
+    async def _discard(self, page):
+        self._dirty.discard(page)
+        await _close_quietly(page.target.browserContext)
+
+    def mark_dirty(self, page):
+        """Flag a leased page whose view must be reset before its next lease."""
+        self._dirty.add(page)
+
+    async def _park(self, page):
+        if page in self._dirty:
+            self._dirty.discard(page)
+            await page.reload()
+            await _show_table_view(page, self.debug)
+
+    @asynccontextmanager
+    async def lease(self):
+        await self.start()
+        # A None slot stands for a page that was discarded and not yet replaced
+        page = await self._idle.get()
+        try:
+            if page is None:
+                page = await self._new_page()
+            yield page
+            await self._park(page)
+        except BaseException:
+            if page is not None:
+                await self._discard(page)
+            page = None
+            raise
+        finally:
+            self._idle.put_nowait(page)
+
+
 class BCHydroApiSimple:
     def __init__(
-        self, username: str, password: str, browser_exec_path: Optional[str] = None
+        self,
+        username: str,
+        password: str,
+        browser_exec_path: Optional[str] = None,
+        pool: Optional[BCHydroBrowserPool] = None,
+        debug: bool = False,
+        block_resources: bool = True,
+        parse_executor: Optional[Executor] = None,
     ):
         """BC Hydro data accessor through headless browser.
 
@@ -44,33 +367,33 @@ class BCHydroApiSimple:
             username (str): BCHydro username
             password (str): BCHydro password
             browser_exec_path (str): Path to browser executabble. Useful if browser is not in PATH.
+            pool (BCHydroBrowserPool): Lease warm, logged-in pages from this pool instead of
+                launching a browser for this instance.
+            debug (bool): Slow the browser down and write screenshots and `table.html`
+                to the working directory.
+            block_resources (bool): Skip loading images, fonts and stylesheets.
+            parse_executor (Executor): Parse consumption XML and tables on this thread or
+                process pool instead of the event loop.
 
         """
         self.page = None
         self._username = username
         self._password = password
         self.browser_exec_path = browser_exec_path
-
-    async def _sign_in(self, username, password, browser_exec_path):
-        browser = await launch(
-            slowMo=True,
-            autoclose=True,
-            devtools=False,
-            executablePath=browser_exec_path,
-        )
-        page = await browser.newPage()
-
-        logger.debug("Populating login form...")
-        await page.goto(URL_LOGIN_PAGE)
-        await page.waitForSelector("#email")
-        await page.type("#email", username)
-        await page.type("#password", password)
-
-        logger.debug("Clicking login button...")
-        await asyncio.gather(
-            page.waitForNavigation(),
-            page.click("#submit-button"),
-        )
+        self.pool = pool
+        self.debug = debug
+        self.block_resources = block_resources
+        self.parse_executor = parse_executor
+
+    async def _sign_in(self, username, password, browser_exec_path, throttled=True):
+        browser = await _launch_browser(browser_exec_path, self.debug)
+        try:
+            page = await browser.newPage()
+            await _intercept(page, self.block_resources)
+            await _log_in(page, username, password, throttled)
+        except BaseException:
+            await browser.close()
+            raise
         return page
 
     def _authenticated(func):
@@ -83,97 +406,89 @@ class BCHydroApiSimple:
 
         return wrapper
 
-    @_authenticated
-    async def get_usage_table(self, period: str = ENUM_CURRENT_BILLING_PERIOD):
-        # Navigate to Consumption page by clicking button:
-        logger.debug("Clicking Detailed Consumption button...")
-        await self.page.waitForSelector("#detailCon:not([disabled])")
-        await asyncio.gather(
-            self.page.waitForNavigation(),
-            self.page.click("#detailCon"),
-        )
-
-        await self.page.screenshot({"path": "s_clickConsumption.png"})
-
-        # Navigate to the table look
-        logger.debug("Clicking Table button...")
-        await self.page.waitForSelector("#tableBtnLabel")
-        await self.page.click("#tableBtnLabel")
-        await self.page.screenshot({"path": "s_afterBtn.png"})
-
-        # Wait until the table with id="consumptionTable" is present
-        await self.page.waitForSelector("table#consumptionTable")
-
-        if period != ENUM_CURRENT_BILLING_PERIOD and period in supported_periods:
-            await self.page.waitForSelector("span#dateSelect-button")
-            await self.page.click("span#dateSelect-button")
-
-            # Wait until the dropdown is present
-            await self.page.waitForSelector("div.ui-menu-item-wrapper")
-            options = await self.page.querySelectorAll("div.ui-menu-item-wrapper")
-            for option in options:
-                text = await self.page.evaluate("(el) => el.textContent", option)
-                if text == period:
-                    await option.click()
-                    break
+    async def export_session(self, throttled: bool = True) -> dict:
+        """Log in with the browser, then close it and return the session.
 
-            # Wait until the table with id="consumptionTable" is present after changing the table
-            await self.page.waitForSelector("table#consumptionTable")
+        Returns a dict with the page's `cookies` (as produced by
+        `bchydro.session.dump_cookies()`) and the `page_html` the login landed
+        on, which holds the bchydroparam token. See `BCHydroApiHybrid`.
 
-        # Download the whole table at id="consumptionTable"
-        html_table = await self.page.evaluate(
-            "document.querySelector('table#consumptionTable').outerHTML"
+        Pass `throttled=False` if the caller already waited on a login limiter.
+        """
+        page = await self._sign_in(
+            self._username, self._password, self.browser_exec_path, throttled
         )
-        with open("table.html", "w") as f:
-            f.write(html_table)
+        try:
+            return {
+                "cookies": cookies_from_browser(await page.cookies()),
+                "page_html": await page.content(),
+            }
+        finally:
+            await page.browser.close()
 
-        table = self.__parse_consumption_table(html_table)
-
-        return table
-
-    def __parse_consumption_table(self, html_table: str):
-        """Parse the consumption table from the HTML content.
+    async def get_usage_table(self, period: str = ENUM_CURRENT_BILLING_PERIOD):
+        if self.pool is None:
+            return await self._get_usage_table(period)
 
-        Converts <table>...</table> HTML content to a dictionary.
-        It's expected that the table is a daily consumption with the day in the 'Date' column.
-        Parsing converts Date into the key (`YYYY-MM-dd`) for the dictionary, and all columns are flatten into the dictionary per row.
+        async with self.pool.lease() as page:
+            html_table = await self._read_usage_table(page, period)
+            if period != ENUM_CURRENT_BILLING_PERIOD:
+                self.pool.mark_dirty(page)
 
-        Args:
-            html_table (str): HTML content of the table, i.e. <table>...</table>
+        return await run_parser(
+            self.parse_executor, _parse_consumption_table, html_table
+        )
 
-        Returns:
-            dict: Dictionary with the table data, where the keys are the date in short-ISO format (2024-09-01).
+    async def get_usage(self, hourly=False) -> BCHydroDailyUsage:
+        """Current billing period usage, captured from the page's own XHR.
 
+        The consumption-data.html response the portal page requests is read
+        straight off the network and parsed like `BCHydroApi.refresh()`, so no
+        table is rendered or scraped. With `hourly`, the intercepted request
+        is rewritten to ask for hourly granularity.
         """
+        granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        if self.pool is None:
+            xml = await self._capture_usage(granularity)
+        else:
+            async with self.pool.lease() as page:
+                xml = await _capture_consumption(page, granularity, page.reload)
+                # The reload leaves the page on the default chart view
+                await _show_table_view(page, self.debug)
+
+        points, rates = await run_consumption_parser(self.parse_executor, xml)
+        return BCHydroDailyUsage(electricity=points, rates=rates, account=None)
 
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(html_table, "html.parser")
-
-        # Find the table element
-        table = soup.find("table")
-
-        # Extract table rows
-        rows = table.find_all("tr")
+    @_authenticated
+    async def _capture_usage(self, granularity) -> str:
+        async def open_consumption_page():
+            logger.debug("Clicking Detailed Consumption button...")
+            await self.page.waitForSelector("#detailCon:not([disabled])")
+            await asyncio.gather(
+                self.page.waitForNavigation(),
+                self.page.click("#detailCon"),
+            )
 
-        # Initialize the dictionary to store the table data
-        table_dict = {}
+        return await _capture_consumption(self.page, granularity, open_consumption_page)
 
-        # Extract the header row to get the field names
-        headers = [
-            header.get_text(strip=True) for header in rows[0].find_all(["td", "th"])
-        ]
+    @_authenticated
+    async def _get_usage_table(self, period):
+        await _show_consumption_table(self.page, self.debug)
+        html_table = await self._read_usage_table(self.page, period)
+        return await run_parser(
+            self.parse_executor, _parse_consumption_table, html_table
+        )
 
-        # Iterate over the rows and populate the dictionary
-        for row in rows[1:]:  # Skip the header row
-            cells = row.find_all(["td", "th"])
-            cell_data = [cell.get_text(strip=True) for cell in cells]
-            row_dict = dict(zip(headers, cell_data))
+    async def _read_usage_table(self, page, period) -> str:
+        if period != ENUM_CURRENT_BILLING_PERIOD and period in supported_periods:
+            await _select_period(page, period)
 
-            date_key = row_dict.get("Date")
-            if date_key:
-                date_obj = datetime.strptime(date_key, "%b %d, %Y")
-                formatted_date = date_obj.strftime("%Y-%m-%d")
-                row_dict["Date"] = formatted_date
-                table_dict[formatted_date] = row_dict
+        # Download the whole table at id="consumptionTable"
+        html_table = await page.evaluate(
+            "document.querySelector('table#consumptionTable').outerHTML"
+        )
+        if self.debug:
+            with open("table.html", "w") as f:
+                f.write(html_table)
 
-        return table_dict
+        return html_table
@@ -0,0 +1,178 @@
+"""Chunked, resumable history backfill"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Tuple
+
+from .const import (
+    DEFAULT_BACKFILL_CONCURRENCY,
+    GRANULARITY_DAILY,
+    GRANULARITY_HOURLY,
+    MAX_RANGE_DAYS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+class BCHydroBackfill:
+    def __init__(
+        self,
+        api,
+        start: date,
+        end: date,
+        hourly=False,
+        account_id: str = None,
+        chunk_days: int = None,
+        concurrency=DEFAULT_BACKFILL_CONCURRENCY,
+        checkpoint_path: str = None,
+    ):
+        """Fetch a long [start, end) history from a `BCHydroApi` in chunks.
+
+        The range is split into chunks of at most `chunk_days` (capped by what
+        the portal accepts for the granularity) and up to `concurrency` chunks
+        are fetched at once. Chunks bypass the usage cache.
+
+        With a `checkpoint_path`, every chunk handed to the caller is recorded
+        in a JSON file, and a later run over the same range skips them. The
+        checkpoint records the account fetched; without an `account_id` that
+        is the default account, resolved when `run` logs in.
+        """
+        self._api = api
+        self.start = _as_date(start)
+        self.end = _as_date(end)
+        self.hourly = hourly
+        self.granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        self.account_id = account_id
+        max_days = MAX_RANGE_DAYS[self.granularity]
+        self.chunk_days = min(chunk_days or max_days, max_days)
+        self.concurrency = concurrency
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint = self._load_checkpoint()
+        self.completed = set(self._checkpoint.get("completed", []))
+
+    def chunks(self) -> List[Tuple[date, date]]:
+        chunks = []
+        chunk_start = self.start
+        while chunk_start < self.end:
+            chunk_end = min(chunk_start + timedelta(days=self.chunk_days), self.end)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end
+        return chunks
+
+    def pending(self) -> List[Tuple[date, date]]:
+        return [c for c in self.chunks() if self._chunk_id(c) not in self.completed]
+
+    async def run(self, on_chunk: Callable) -> int:
+        """Fetch every pending chunk, returning how many were fetched.
+
+        `on_chunk(start, end, usage)` is called (and awaited, if it returns an
+        awaitable) as each chunk arrives, in completion order. A chunk is only
+        checkpointed after `on_chunk` returns, so a failure in either the fetch
+        or the callback leaves it to be fetched again on the next run.
+        """
+        await self._resolve_account()
+        pending = self.pending()
+        _LOGGER.debug(
+            "Backfilling %d of %d %s chunks",
+            len(pending),
+            len(self.chunks()),
+            self.granularity,
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(chunk):
+            async with semaphore:
+                usage = await self._api.fetch_range(
+                    chunk[0],
+                    chunk[1],
+                    hourly=self.hourly,
+                    account_id=self.account_id,
+                    use_cache=False,
+                )
+            result = on_chunk(chunk[0], chunk[1], usage)
+            if inspect.isawaitable(result):
+                await result
+            self.completed.add(self._chunk_id(chunk))
+            self._save_checkpoint()
+
+        tasks = [asyncio.ensure_future(fetch(chunk)) for chunk in pending]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return len(pending)
+
+    async def export(self, exporter) -> int:
+        """Write every pending chunk to a `bchydro.export` exporter.
+
+        The exporter is flushed after each chunk, before it is checkpointed,
+        so every checkpointed chunk has been written out. Memory is bounded by
+        the chunks in flight. Returns how many chunks were fetched.
+        """
+
+        def write_chunk(start, end, usage):
+            exporter.write_many(usage.electricity)
+            exporter.flush()
+
+        return await self.run(write_chunk)
+
+    def _chunk_id(self, chunk: Tuple[date, date]) -> str:
+        return f"{chunk[0].isoformat()}/{chunk[1].isoformat()}"
+
+    def _checkpoint_scope(self) -> dict:
+        return {"account_id": self.account_id, "granularity": self.granularity}
+
+    async def _resolve_account(self):
+        """Pin the default account, so the checkpoint names the one fetched."""
+        if self.account_id is not None:
+            return
+
+        await self._api._ensure_authenticated()
+        self.account_id = self._api.account.evpAccountId
+        self._check_checkpoint(self._checkpoint)
+
+    def _check_checkpoint(self, checkpoint: dict):
+        if not checkpoint:
+            return
+
+        scope = self._checkpoint_scope()
+        if self.account_id is None:
+            # Not known until `run` logs in, which checks it then
+            del scope["account_id"]
+        if {k: checkpoint.get(k) for k in scope} != scope:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to a different backfill"
+            )
+
+    def _load_checkpoint(self) -> dict:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+
+        self._check_checkpoint(checkpoint)
+        return checkpoint
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+
+        checkpoint = dict(self._checkpoint_scope(), completed=sorted(self.completed))
+        # Write then rename so an interrupted save never corrupts the checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
@@ -1,33 +1,96 @@
 """BCHydro Constants"""
 
+import os
+
 # Customized user agent for getting the attention of BCHydro devs
 USER_AGENT = "https://github.com/emcniece/bchydro#disclaimer"
 
+# Portal origin. Set BCHYDRO_BASE_URL (before importing bchydro) to point the
+# clients at a stand-in server, e.g. benchmarks/portal.py.
+BASE_URL = os.environ.get("BCHYDRO_BASE_URL", "https://app.bchydro.com").rstrip("/")
+
 # Main login page. Several redirects follow.
-URL_POST_LOGIN = "https://app.bchydro.com/sso/UI/Login"
+URL_POST_LOGIN = BASE_URL + "/sso/UI/Login"
 
 # Goto URL that gets appended to the initial URL_POST_LOGIN request
-URL_LOGIN_GOTO = "https://app.bchydro.com:443/BCHCustomerPortal/web/login.html"
-
-URL_GET_ACCOUNTS = "https://app.bchydro.com/BCHCustomerPortal/web/getAccounts.html"
-URL_ACCOUNTS_OVERVIEW = (
-    "https://app.bchydro.com/BCHCustomerPortal/web/accountsOverview.html"
+_GOTO_BASE_URL = BASE_URL.replace(
+    "https://app.bchydro.com", "https://app.bchydro.com:443"
 )
+URL_LOGIN_GOTO = _GOTO_BASE_URL + "/BCHCustomerPortal/web/login.html"
+
+URL_GET_ACCOUNTS = BASE_URL + "/BCHCustomerPortal/web/getAccounts.html"
+URL_ACCOUNTS_OVERVIEW = BASE_URL + "/BCHCustomerPortal/web/accountsOverview.html"
 
 # This GET endpoint returns JSON account details.
-URL_GET_ACCOUNT_JSON = "https://app.bchydro.com/evportlet/web/global-data.html"
+URL_GET_ACCOUNT_JSON = BASE_URL + "/evportlet/web/global-data.html"
 
 # This consmption URL has more detail than URL_GET_USAGE but needs different form fields.
-URL_POST_CONSUMPTION_XML = "https://app.bchydro.com/evportlet/web/consumption-data.html"
+URL_POST_CONSUMPTION_XML = BASE_URL + "/evportlet/web/consumption-data.html"
 
 # Time constants in seconds
 FIVE_MINUTES = 300
 
+# Token-bucket limits: at most CALLS requests in a burst, refilled over PERIOD
+LOGIN_RATE_CALLS = 3
+LOGIN_RATE_PERIOD = FIVE_MINUTES
+DATA_RATE_CALLS = 10
+DATA_RATE_PERIOD = 10
+
+# Connection pool settings for the long-lived HTTP session
+CONNECTION_LIMIT = 10
+DNS_CACHE_TTL = FIVE_MINUTES
+KEEPALIVE_TIMEOUT = 60
+
+# Bytes read per chunk when streaming consumption XML into the parser
+XML_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of (account, granularity, date range) results kept in memory
+DEFAULT_CACHE_SIZE = 32
+
+# Accounts fetched at once by BCHydroApi.refresh_accounts()
+DEFAULT_ACCOUNT_CONCURRENCY = 4
+
+# Consumption granularities accepted by URL_POST_CONSUMPTION_XML
+GRANULARITY_DAILY = "daily"
+GRANULARITY_HOURLY = "hourly"
+
+# DateRange values for URL_POST_CONSUMPTION_XML; custom uses Start/EndDateTime
+DATE_RANGE_CURRENT_BILL = "currentBill"
+DATE_RANGE_CUSTOM = "custom"
+
+# Longest range, in days, requested at once per granularity when backfilling
+MAX_RANGE_DAYS = {GRANULARITY_DAILY: 365, GRANULARITY_HOURLY: 31}
+
+# Backfill chunks fetched at once
+DEFAULT_BACKFILL_CONCURRENCY = 2
+
+# Points buffered by exporters before a batch (or Parquet row group) is written
+EXPORT_FLUSH_SIZE = 1000
+
+# BCHydroPoller delays in seconds; the delay grows by POLL_BACKOFF while no
+# new interval appears and is spread by +/- POLL_JITTER (a fraction)
+POLL_INTERVAL = 3 * FIVE_MINUTES
+POLL_MIN_INTERVAL = FIVE_MINUTES
+POLL_MAX_INTERVAL = 6 * 60 * 60
+POLL_BACKOFF = 2
+POLL_JITTER = 0.1
+
+# Portal sessions are assumed to expire SESSION_TTL seconds after login, and
+# are renewed in the background SESSION_RENEW_MARGIN before that
+SESSION_TTL = 30 * 60
+SESSION_RENEW_MARGIN = 2 * FIVE_MINUTES
+
+# Upper bounds, in seconds, of the phase latency histogram buckets
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+URL_LOGIN_PAGE = BASE_URL + "/BCHCustomerPortal/web/login.html"
 
-URL_LOGIN_PAGE = "https://app.bchydro.com/BCHCustomerPortal/web/login.html"
+# Resource types the headless browser skips loading
+BLOCKED_RESOURCE_TYPES = ("image", "font", "stylesheet", "media")
 
 # Period constants
 ENUM_CURRENT_BILLING_PERIOD = "Current billing period"
 ENUM_LAST_BILLING_PERIOD = "Last billing period"
 ENUM_LAST_7_DAYS = "Last 7 days"
-ENUM_LAST_30_DAYS = "Last 30 days"
\ No newline at end of file
+ENUM_LAST_30_DAYS = "Last 30 days"
@@ -0,0 +1,126 @@
+"""What changed between two usage results"""
+
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from .types import BCHydroDailyElectricity, BCHydroDailyUsage, BCHydroRates
+
+
+def time_key(value: str) -> str:
+    """Sortable key of a portal ISO 8601 time: the UTC time, if it has an offset.
+
+    Wall-clock times repeat when DST ends ("01:00:00-07:00", then
+    "01:00:00-08:00"), so they cannot identify an interval on their own.
+    Times without an offset are keyed on their wall-clock part.
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return (value or "")[:19]
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat(timespec="seconds")
+
+
+def start_key(point: BCHydroDailyElectricity) -> str:
+    """Sortable key of a point's start; see `time_key()`."""
+    return time_key(point.interval.start)
+
+
+def _point_values(point: BCHydroDailyElectricity) -> tuple:
+    return (point.type, point.quality, point.consumption, point.cost)
+
+
+def _rates_values(rates: BCHydroRates) -> dict:
+    return vars(rates) if rates is not None else None
+
+
+def _same_period(previous: BCHydroDailyUsage, current: BCHydroDailyUsage) -> bool:
+    if previous.account is None or current.account is None:
+        return previous.account is current.account
+    return (previous.account.evpAccountId, previous.account.evpBillingStart) == (
+        current.account.evpAccountId,
+        current.account.evpBillingStart,
+    )
+
+
+def latest_valid(
+    points: List[BCHydroDailyElectricity],
+    is_valid: Callable[[BCHydroDailyElectricity], bool],
+) -> BCHydroDailyElectricity:
+    """Newest point passing `is_valid`, looking back only past invalid ones."""
+    for point in reversed(points):
+        if is_valid(point):
+            return point
+    return None
+
+
+class BCHydroUsageDelta:
+    def __init__(
+        self,
+        appended: List[BCHydroDailyElectricity],
+        revised: List[BCHydroDailyElectricity],
+        rates_changed: bool,
+        latest_point: BCHydroDailyElectricity,
+        reset: bool,
+    ):
+        """Difference between a usage result and the one before it.
+
+        `appended` holds points that were not there before and `revised` the
+        ones whose quality, consumption or cost changed (e.g. ESTIMATED to
+        ACTUAL). `reset` means there was nothing comparable before (first
+        refresh, another account or a new billing period): every point is in
+        `appended` and stored copies of the old period should be replaced.
+        """
+        self.appended = appended
+        self.revised = revised
+        self.rates_changed = rates_changed
+        self.latest_point = latest_point
+        self.reset = reset
+
+    def __bool__(self):
+        return bool(self.appended or self.revised or self.rates_changed)
+
+    def __repr__(self):
+        return (
+            f"BCHydroUsageDelta(appended={len(self.appended)}, "
+            f"revised={len(self.revised)}, rates_changed={self.rates_changed}, "
+            f"reset={self.reset})"
+        )
+
+    @property
+    def changed(self) -> List[BCHydroDailyElectricity]:
+        """Points a writer needs to upsert to catch up, oldest first."""
+        return sorted(self.revised + self.appended, key=start_key)
+
+
+def diff_usage(
+    previous: BCHydroDailyUsage,
+    current: BCHydroDailyUsage,
+    is_valid: Callable[[BCHydroDailyElectricity], bool],
+) -> BCHydroUsageDelta:
+    """Compare `current` against `previous` with one pass over each."""
+    points = current.electricity
+    latest_point = latest_valid(points, is_valid)
+
+    if previous is current:
+        # A cached result handed out again; nothing can have changed
+        return BCHydroUsageDelta([], [], False, latest_point, reset=False)
+    if previous is None or not _same_period(previous, current):
+        return BCHydroUsageDelta(list(points), [], True, latest_point, reset=True)
+
+    # The full start string, offset included, identifies an interval; it is
+    # much cheaper than start_key(), and no ordering is needed here
+    before = {p.interval.start: _point_values(p) for p in previous.electricity}
+    appended, revised = [], []
+    for point in points:
+        values = before.get(point.interval.start)
+        if values is None:
+            appended.append(point)
+        elif values != _point_values(point):
+            revised.append(point)
+
+    rates_changed = _rates_values(previous.rates) != _rates_values(current.rates)
+    return BCHydroUsageDelta(
+        appended, revised, rates_changed, latest_point, reset=False
+    )
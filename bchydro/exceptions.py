@@ -2,6 +2,10 @@ class BCHydroAuthException(Exception):
     pass
 
 
+class BCHydroSessionExpiredException(BCHydroAuthException):
+    pass
+
+
 class BCHydroParamException(Exception):
     pass
 
@@ -0,0 +1,197 @@
+"""Batched writers for streams of usage points"""
+
+import csv
+from datetime import datetime
+from typing import AsyncIterable, Dict, Iterable, List
+
+from .const import EXPORT_FLUSH_SIZE
+from .types import ROW_FIELDS, BCHydroDailyElectricity
+
+# Column order shared by the tabular exporters
+COLUMNS = ROW_FIELDS
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BCHydroExporter:
+    def __init__(self, flush_size: int = EXPORT_FLUSH_SIZE):
+        """Buffer points and hand them to `write_batch()` `flush_size` at a time.
+
+        Memory is bounded by one batch whatever the length of the stream.
+        Subclasses implement `write_batch()` and may extend `close()`.
+        """
+        self.flush_size = flush_size
+        self.written = 0
+        self._batch: List[BCHydroDailyElectricity] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, point: BCHydroDailyElectricity):
+        self._batch.append(point)
+        if len(self._batch) >= self.flush_size:
+            self.flush()
+
+    def write_many(self, points: Iterable[BCHydroDailyElectricity]):
+        for point in points:
+            self.write(point)
+
+    async def consume(self, points: AsyncIterable[BCHydroDailyElectricity]) -> int:
+        """Write every point of an async stream and flush; returns the count."""
+        count = 0
+        async for point in points:
+            self.write(point)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self):
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self.write_batch(batch)
+            self.written += len(batch)
+
+    def write_batch(self, points: List[BCHydroDailyElectricity]):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+
+class _FileExporter(BCHydroExporter):
+    def __init__(self, file, flush_size: int, newline=None):
+        super().__init__(flush_size)
+        # Files opened here are closed here; file objects are left open
+        self._owns_file = isinstance(file, str)
+        if self._owns_file:
+            file = open(file, "w", encoding="utf-8", newline=newline)
+        self.file = file
+
+    def close(self):
+        super().close()
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class BCHydroCsvExporter(_FileExporter):
+    def __init__(self, file, flush_size: int = EXPORT_FLUSH_SIZE, header=True):
+        """CSV with one row per point, to a path or an open text file.
+
+        Values are written exactly as the portal reports them.
+        """
+        super().__init__(file, flush_size, newline="")
+        self._writer = csv.writer(self.file)
+        if header:
+            self._writer.writerow(COLUMNS)
+
+    def write_batch(self, points: List[BCHydroDailyElectricity]):
+        self._writer.writerows(p.to_row() for p in points)
+        self.file.flush()
+
+
+# Characters escaped in line protocol measurement names, tag keys and values
+_TAG_ESCAPES = str.maketrans({"\\": "\\\\", ",": r"\,", "=": r"\=", " ": r"\ "})
+
+
+def _escape_tag(value: str) -> str:
+    return str(value).translate(_TAG_ESCAPES)
+
+
+class BCHydroLineProtocolExporter(_FileExporter):
+    def __init__(
+        self,
+        file,
+        measurement: str = "electricity",
+        tags: Dict[str, str] = None,
+        flush_size: int = EXPORT_FLUSH_SIZE,
+    ):
+        """InfluxDB line protocol, one line per point, to a path or text file.
+
+        Each line is tagged with `quality` and any extra `tags` (e.g. the
+        account id), carries `consumption` and `cost` fields, and is stamped
+        with the interval start in nanoseconds.
+        """
+        super().__init__(file, flush_size)
+        self.measurement = _escape_tag(measurement)
+        self._tags = "".join(
+            f",{_escape_tag(k)}={_escape_tag(v)}"
+            for k, v in sorted((tags or {}).items())
+        )
+
+    def _line(self, point: BCHydroDailyElectricity) -> str:
+        fields = [
+            f"{name}={value}"
+            for name, value in (
+                ("consumption", _float(point.consumption)),
+                ("cost", _float(point.cost)),
+            )
+            if value is not None
+        ]
+        if not fields:
+            # A line needs at least one field; there is nothing to record
+            return ""
+        timestamp = int(datetime.fromisoformat(point.interval.start).timestamp())
+        return (
+            f"{self.measurement}{self._tags},quality={_escape_tag(point.quality)}"
+            f" {','.join(fields)} {timestamp}000000000\n"
+        )
+
+    def write_batch(self, points: List[BCHydroDailyElectricity]):
+        self.file.writelines(self._line(p) for p in points)
+        self.file.flush()
+
+
+class BCHydroParquetExporter(BCHydroExporter):
+    def __init__(self, path: str, row_group_size: int = EXPORT_FLUSH_SIZE):
+        """Parquet file with one row group per `row_group_size` points.
+
+        Requires pyarrow (`pip install bchydro[parquet]`). Timestamps are kept
+        as the portal's ISO 8601 strings, including their UTC offset;
+        consumption and cost are float64.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "BCHydroParquetExporter requires pyarrow; install it with "
+                "`pip install bchydro[parquet]`"
+            ) from e
+
+        super().__init__(row_group_size)
+        self._pa = pa
+        self.schema = pa.schema(
+            [
+                ("start", pa.string()),
+                ("end", pa.string()),
+                ("type", pa.string()),
+                ("quality", pa.string()),
+                ("consumption", pa.float64()),
+                ("cost", pa.float64()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write_batch(self, points: List[BCHydroDailyElectricity]):
+        columns = list(zip(*(p.to_row() for p in points)))
+        columns[4] = [_float(v) for v in columns[4]]
+        columns[5] = [_float(v) for v in columns[5]]
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(c, type=f.type) for c, f in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_table(table, row_group_size=len(points))
+
+    def close(self):
+        super().close()
+        self._writer.close()
@@ -0,0 +1,150 @@
+"""Columnar usage representation backed by NumPy"""
+
+from typing import Iterable, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError(
+        "BCHydroUsageFrame requires numpy; install it with `pip install bchydro[numpy]`"
+    ) from e
+
+from .parsing import BCHydroConsumptionParser, row_from_attrib
+from .types import BCHydroDailyElectricity
+
+# Resampling frequencies and the datetime64 unit each one truncates to
+RESAMPLE_UNITS = {"h": "h", "D": "D", "W": "D", "M": "M", "Y": "Y"}
+
+
+def _to_datetime64(values) -> np.ndarray:
+    # Timestamps are kept in the portal's local wall-clock time; the UTC offset
+    # suffix is dropped so that daily and hourly buckets line up with the bill.
+    return np.array([(v or "NaT")[:19] for v in values], dtype="datetime64[s]")
+
+
+def _to_float64(values) -> np.ndarray:
+    return np.array([v or "nan" for v in values], dtype=np.float64)
+
+
+class BCHydroUsageFrame:
+    # Pass as `point_factory` to BCHydroConsumptionParser to skip point objects
+    row_from_attrib = staticmethod(row_from_attrib)
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        consumption: np.ndarray,
+        cost: np.ndarray,
+        quality_codes: np.ndarray,
+        quality_categories: Tuple[str, ...],
+    ):
+        """Column arrays for a run of usage points, one row per interval.
+
+        `start` and `end` are datetime64[s], `consumption` and `cost` float64,
+        and quality is categorical: `quality_codes` index `quality_categories`.
+        """
+        self.start = start
+        self.end = end
+        self.consumption = consumption
+        self.cost = cost
+        self.quality_codes = quality_codes
+        self.quality_categories = tuple(quality_categories)
+
+    def __len__(self):
+        return len(self.start)
+
+    def __repr__(self):
+        return f"BCHydroUsageFrame({len(self)} rows, {self.quality_categories})"
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "BCHydroUsageFrame":
+        """Build from string tuples laid out as `types.ROW_FIELDS`."""
+        columns = list(zip(*rows)) or [()] * 6
+        starts, ends, _, quality, consumption, cost = columns
+        categories, codes = np.unique(
+            np.array(quality, dtype=object).astype(str), return_inverse=True
+        )
+        return cls(
+            start=_to_datetime64(starts),
+            end=_to_datetime64(ends),
+            consumption=_to_float64(consumption),
+            cost=_to_float64(cost),
+            quality_codes=codes.astype(np.int8),
+            quality_categories=tuple(categories.tolist()),
+        )
+
+    @classmethod
+    def from_points(
+        cls, points: Iterable[BCHydroDailyElectricity]
+    ) -> "BCHydroUsageFrame":
+        return cls.from_rows(p.to_row() for p in points)
+
+    @classmethod
+    def from_xml(cls, data, actual_only=True) -> "BCHydroUsageFrame":
+        """Build straight from a consumption-data.html body."""
+        parser = BCHydroConsumptionParser(
+            actual_only=actual_only, point_factory=row_from_attrib
+        )
+        rows = parser.feed(data)
+        rows.extend(parser.close())
+        return cls.from_rows(rows)
+
+    @property
+    def quality(self) -> np.ndarray:
+        return np.array(self.quality_categories, dtype=object)[self.quality_codes]
+
+    def take(self, indices) -> "BCHydroUsageFrame":
+        return BCHydroUsageFrame(
+            self.start[indices],
+            self.end[indices],
+            self.consumption[indices],
+            self.cost[indices],
+            self.quality_codes[indices],
+            self.quality_categories,
+        )
+
+    def where_quality(self, quality: str) -> "BCHydroUsageFrame":
+        if quality not in self.quality_categories:
+            return self.take(np.zeros(len(self), dtype=bool))
+        code = self.quality_categories.index(quality)
+        return self.take(self.quality_codes == code)
+
+    def total_consumption(self) -> float:
+        return float(np.nansum(self.consumption))
+
+    def total_cost(self) -> float:
+        return float(np.nansum(self.cost))
+
+    def resample(self, freq: str = "D") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sum consumption and cost into buckets.
+
+        `freq` is one of "h", "D", "W" (weeks starting Monday), "M" or "Y".
+        Returns (bucket_start, consumption, cost) arrays sorted by bucket.
+        """
+        if freq not in RESAMPLE_UNITS:
+            raise ValueError(f"Unsupported resample frequency: {freq}")
+
+        buckets = self.start.astype(f"datetime64[{RESAMPLE_UNITS[freq]}]")
+        if freq == "W":
+            # 1970-01-01 was a Thursday, so shift day numbers to land on Monday
+            days = buckets.astype(np.int64)
+            buckets = (days - (days + 3) % 7).astype("datetime64[D]")
+
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        consumption = np.bincount(
+            inverse, weights=np.nan_to_num(self.consumption), minlength=len(keys)
+        )
+        cost = np.bincount(
+            inverse, weights=np.nan_to_num(self.cost), minlength=len(keys)
+        )
+        return keys, consumption, cost
+
+    def peaks(self, n: int = 1, field: str = "consumption") -> "BCHydroUsageFrame":
+        """Rows with the `n` largest values of `field`, largest first."""
+        values = np.nan_to_num(getattr(self, field), nan=-np.inf)
+        n = min(n, len(values))
+        if n <= 0:
+            return self.take(np.zeros(0, dtype=np.intp))
+        top = np.argpartition(values, -n)[-n:]
+        return self.take(top[np.argsort(values[top])[::-1]])
@@ -0,0 +1,134 @@
+"""Single-pass scanning of portal HTML pages"""
+
+import re
+from html import unescape
+from typing import List
+
+from .exceptions import BCHydroParamException
+
+# Inside of a tag up to its ">", where quoted attribute values may contain ">"
+_TAG_BODY = r"""(?:[^>"']|"[^"]*"|'[^']*')*"""
+
+# Start tags, comments and raw-text elements, found in document order
+_TOKEN_RE = re.compile(
+    rf"<!--.*?-->|<(script|style)\b{_TAG_BODY}>.*?</\1\s*>"
+    rf"|<([a-zA-Z][\w:-]*)((?:\s{_TAG_BODY})?)>",
+    re.DOTALL | re.IGNORECASE,
+)
+_ATTR_RE = re.compile(r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_TAG_RE = re.compile(rf"<{_TAG_BODY}>")
+
+# Elements whose content is not markup, so may hold a literal closing tag
+_HIDING_TAG_RE = re.compile(r"<(?:script|style|textarea)\b", re.IGNORECASE)
+
+# Cheap substring checks that let most tags skip attribute parsing
+_INTERESTING = ("bchydroparam", "accountListDiv", "alert")
+
+
+class BCHydroPageScan:
+    def __init__(
+        self, bchydroparam: str, has_account_list: bool, alert_errors: List[str]
+    ):
+        """What the login flow needs from a portal page."""
+        self.bchydroparam = bchydroparam
+        self.has_account_list = has_account_list
+        self.alert_errors = alert_errors
+
+    def __repr__(self):
+        return f"BCHydroPageScan('{self.bchydroparam}', {self.has_account_list}, {self.alert_errors})"
+
+
+def _parse_attrs(attr_text: str) -> dict:
+    attrs = {}
+    for match in _ATTR_RE.finditer(attr_text):
+        name, *values = match.groups()
+        value = next((v for v in values if v is not None), "")
+        attrs.setdefault(name.lower(), unescape(value))
+    return attrs
+
+
+def _element_text(html: str, tag: str, start: int) -> str:
+    """Text up to the closing tag, or None if a same-named tag, a comment or
+    a raw-text element is inside, any of which can hide the real closing tag."""
+    close = re.compile(rf"</{tag}\s*>", re.IGNORECASE).search(html, start)
+    if close is None:
+        return None
+    end = close.start()
+    inner = html[start:end]
+    if "<!--" in inner or _HIDING_TAG_RE.search(inner):
+        return None
+    if re.search(rf"<{tag}\b", inner, re.IGNORECASE):
+        return None
+    return unescape(_TAG_RE.sub("", inner))
+
+
+def _fast_scan(html: str) -> BCHydroPageScan:
+    """Scan tags once with regular expressions; None if the page is ambiguous."""
+    span_param = input_param = None
+    has_account_list = False
+    alert_errors = []
+
+    for match in _TOKEN_RE.finditer(html):
+        tag, attr_text = match.group(2), match.group(3)
+        if tag is None or not any(s in attr_text for s in _INTERESTING):
+            continue
+
+        tag = tag.lower()
+        attrs = _parse_attrs(attr_text)
+        classes = attrs.get("class", "").split()
+
+        if attrs.get("id") == "bchydroparam" and span_param is None:
+            span_param = _element_text(html, tag, match.end())
+            if span_param is None:
+                return None
+        if tag == "input" and attrs.get("name") == "bchydroparam":
+            input_param = input_param or attrs.get("value")
+        if tag == "div" and "accountListDiv" in classes:
+            has_account_list = True
+        if "alert" in classes and "error" in classes and "hidden" not in classes:
+            text = _element_text(html, tag, match.end())
+            if text is None:
+                return None
+            alert_errors.append(text)
+
+    bchydroparam = span_param if span_param is not None else input_param
+    if bchydroparam is None:
+        return None
+    return BCHydroPageScan(bchydroparam, has_account_list, alert_errors)
+
+
+def _soup_scan(html: str) -> BCHydroPageScan:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, features="html.parser")
+    return BCHydroPageScan(
+        _parse_bchydroparam(soup),
+        bool(soup.find_all("div", class_="accountListDiv")),
+        [e.text for e in soup.select(".alert.error:not(.hidden)")],
+    )
+
+
+def _parse_bchydroparam(soup) -> str:
+    """
+    Extract bchydroparam from page HTML for use in the consumption endpoint.
+    The param often appears twice: a hidden <input /> and a <span /> with an id.
+    The <input /> element appears more reliably than the <span /> so we use the input.
+    This seems to be a CSRF token, though it isn't confirmed as such.
+    """
+    span_element = soup.find(id="bchydroparam")
+    if span_element:
+        return span_element.text
+    input_element = soup.find("input", {"name": "bchydroparam"})
+    if input_element:
+        return input_element.get("value")
+    raise BCHydroParamException("Unable to find bchydroparam; likely failed to login")
+
+
+def scan_page(html: str) -> BCHydroPageScan:
+    """Pull the bchydroparam token, account-list marker and alerts from a page.
+
+    A regex scan handles well-formed pages without building a tree; anything
+    it cannot read unambiguously (including a missing token) goes through
+    BeautifulSoup instead.
+    """
+    return _fast_scan(html) or _soup_scan(html)
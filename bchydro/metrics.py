@@ -0,0 +1,164 @@
+"""Pluggable timing and counter hooks, with a Prometheus text exporter"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Dict, List
+
+from .const import METRICS_BUCKETS
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Returned by timer() when metrics are disabled; reusable and free to enter
+_NO_TIMER = nullcontext()
+
+
+class BCHydroMetrics:
+    """Receives measurements from `BCHydroApi`; the base class drops them.
+
+    Subclass and override `observe()` and `inc()` to forward measurements to
+    a metrics backend, or use `BCHydroPrometheusMetrics`.
+
+    Phases passed to `observe()`, in seconds:
+        login     A full login, including account selection
+        account   The global-data account JSON request
+        fetch     A consumption fetch that missed the cache
+        download  Time spent waiting on the consumption response body
+        parse     Time spent parsing the consumption XML
+
+    Counters passed to `inc()`:
+        logins, reauths, renewals, retries, cache_hits, cache_misses,
+        probe_skips, bytes_received, login_wait_seconds, data_wait_seconds
+    """
+
+    def observe(self, phase: str, seconds: float):
+        pass
+
+    def inc(self, name: str, value: float = 1):
+        pass
+
+
+class _Timer:
+    __slots__ = ("metrics", "phase", "start")
+
+    def __init__(self, metrics: BCHydroMetrics, phase: str):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.phase, time.perf_counter() - self.start)
+
+
+def timer(metrics: BCHydroMetrics, phase: str):
+    """Context manager timing `phase`; a shared no-op when `metrics` is None."""
+    if metrics is None:
+        return _NO_TIMER
+    return _Timer(metrics, phase)
+
+
+class BCHydroTimedParser:
+    def __init__(self, parser, metrics: BCHydroMetrics):
+        """Wrap a consumption parser, counting bytes and time spent parsing.
+
+        Only used when metrics are enabled, so the plain parser path is
+        untouched otherwise. Call `report()` once the response is consumed.
+        """
+        self.parser = parser
+        self.metrics = metrics
+        self.received = 0
+        self.parse_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def feed(self, data) -> list:
+        self.received += len(data)
+        start = time.perf_counter()
+        points = self.parser.feed(data)
+        self.parse_seconds += time.perf_counter() - start
+        return points
+
+    def close(self) -> list:
+        start = time.perf_counter()
+        points = self.parser.close()
+        self.parse_seconds += time.perf_counter() - start
+        return points
+
+    def report(self):
+        total = time.perf_counter() - self.started
+        self.metrics.observe("parse", self.parse_seconds)
+        self.metrics.observe("download", total - self.parse_seconds)
+        self.metrics.inc("bytes_received", self.received)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class BCHydroPrometheusMetrics(BCHydroMetrics):
+    def __init__(self, buckets=METRICS_BUCKETS, namespace="bchydro"):
+        """Keep phase histograms and counters for Prometheus to scrape.
+
+        `render()` returns the text exposition format; `handle()` is an
+        aiohttp request handler serving it. Safe to share between clients
+        and to render from another thread.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self.histograms: Dict[str, _Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _render_histograms(self, lines: List[str]):
+        name = f"{self.namespace}_phase_seconds"
+        lines.append(f"# HELP {name} Time spent per request phase.")
+        lines.append(f"# TYPE {name} histogram")
+        for phase, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            bounds = [str(b) for b in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{name}_sum{{phase="{phase}"}} {histogram.sum}')
+            lines.append(f'{name}_count{{phase="{phase}"}} {cumulative}')
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            self._render_histograms(lines)
+            for counter, value in sorted(self.counters.items()):
+                name = f"{self.namespace}_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        return web.Response(
+            body=self.render().encode(), headers={"Content-Type": CONTENT_TYPE}
+        )
@@ -0,0 +1,201 @@
+"""Consumption XML parsing"""
+
+import asyncio
+import xml.etree.ElementTree as ET
+from typing import List, Tuple
+
+from .types import (
+    BCHydroInterval,
+    BCHydroRates,
+    BCHydroDailyElectricity,
+)
+
+from .const import XML_CHUNK_SIZE
+from .exceptions import (
+    BCHydroInvalidXmlException,
+    BCHydroInvalidDataException,
+)
+
+
+def _point_from_attrib(attrib) -> BCHydroDailyElectricity:
+    return BCHydroDailyElectricity(
+        type=attrib.get("type"),
+        quality=attrib.get("quality"),
+        consumption=attrib.get("value"),
+        interval=BCHydroInterval(attrib.get("dateTime"), attrib.get("endTime")),
+        cost=attrib.get("cost"),
+    )
+
+
+def _rates_from_attrib(attrib) -> BCHydroRates:
+    return BCHydroRates(
+        attrib.get("daysSince"),
+        attrib.get("cons2date"),
+        attrib.get("cost2date"),
+        attrib.get("estCons"),
+        attrib.get("estCost"),
+    )
+
+
+class BCHydroConsumptionParser:
+    def __init__(self, actual_only=True, point_factory=_point_from_attrib):
+        """Incremental parser for consumption-data.html responses.
+
+        Feed raw response chunks as they arrive; each call returns the points
+        completed so far. Consumed elements are detached and cleared, so memory
+        stays flat however many points the response holds. Only points in the
+        first <Series> are returned, and by default only ACTUAL ones.
+
+        `point_factory` turns a <Point> attribute dict into the returned value,
+        which is a `BCHydroDailyElectricity` unless overridden.
+        """
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._actual_only = actual_only
+        self._point_factory = point_factory
+        # Elements started but not yet ended, outermost first
+        self._open: List[ET.Element] = []
+        self._series = None
+        self._series_depth = 0
+        self._series_count = 0
+        self.rates: BCHydroRates = None
+
+    def feed(self, data) -> List[BCHydroDailyElectricity]:
+        try:
+            self._parser.feed(data)
+        except ET.ParseError as e:
+            raise BCHydroInvalidXmlException(e)
+        return self._read_points()
+
+    def close(self) -> List[BCHydroDailyElectricity]:
+        try:
+            self._parser.close()
+        except ET.ParseError as e:
+            raise BCHydroInvalidXmlException(e)
+        points = self._read_points()
+
+        if not self._series_count:
+            raise BCHydroInvalidDataException("No Series found in consumption XML")
+        if self.rates is None:
+            raise BCHydroInvalidDataException("No Rates found in consumption XML")
+        return points
+
+    def _read_points(self) -> List[BCHydroDailyElectricity]:
+        points = []
+        try:
+            for event, elem in self._parser.read_events():
+                if event == "start":
+                    self._open.append(elem)
+                    if elem.tag == "Series":
+                        self._series_count += 1
+                        if self._series_count == 1:
+                            self._series = elem
+                            self._series_depth = len(self._open)
+                    continue
+
+                point = self._handle_end(elem)
+                self._open.pop()
+                if point is not None:
+                    points.append(point)
+        except Exception as e:
+            raise BCHydroInvalidDataException(e)
+
+        self._detach_ended()
+        return points
+
+    def _detach_ended(self):
+        """Drop every ended element from the tree, so it never grows."""
+        open_children = self._open[1:] + [None]
+        for parent, child in zip(self._open, open_children):
+            keep = 1 if child is not None and parent[-1] is child else 0
+            end = len(parent) - keep
+            del parent[:end]
+
+    def _handle_end(self, elem):
+        if elem.tag == "Point":
+            return self._handle_point(elem)
+        if elem.tag == "Series":
+            if elem is self._series:
+                self._series = None
+            elem.clear()
+        elif elem.tag == "Rates":
+            self.rates = _rates_from_attrib(elem.attrib)
+        return None
+
+    def _handle_point(self, elem) -> BCHydroDailyElectricity:
+        point = None
+        # For now we're hard-filtering ACTUAL datapoints.
+        # It might be worth looking into ESTIMATED points...
+        # Only points directly inside the first <Series> are usage
+        in_series = (
+            self._series is not None and len(self._open) == self._series_depth + 1
+        )
+        if in_series and (not self._actual_only or elem.get("quality") == "ACTUAL"):
+            point = self._point_factory(elem.attrib)
+        elem.clear()
+        return point
+
+
+def _parse_all(data, actual_only, point_factory) -> Tuple[list, BCHydroRates]:
+    parser = BCHydroConsumptionParser(actual_only, point_factory)
+    points = []
+    # Feeding in slices keeps each C-level parse step short, which lets other
+    # threads (e.g. the event loop, when parsing on a thread pool) run between
+    for offset in range(0, len(data), XML_CHUNK_SIZE):
+        end = offset + XML_CHUNK_SIZE
+        points.extend(parser.feed(data[offset:end]))
+    points.extend(parser.close())
+    return points, parser.rates
+
+
+def parse_consumption_xml(
+    data, actual_only=True
+) -> Tuple[List[BCHydroDailyElectricity], BCHydroRates]:
+    """Parse a complete consumption-data.html body into points and rates."""
+    return _parse_all(data, actual_only, _point_from_attrib)
+
+
+def row_from_attrib(attrib) -> tuple:
+    """A <Point> element's attributes as a tuple laid out as ROW_FIELDS."""
+    return (
+        attrib.get("dateTime"),
+        attrib.get("endTime"),
+        attrib.get("type"),
+        attrib.get("quality"),
+        attrib.get("value"),
+        attrib.get("cost"),
+    )
+
+
+def parse_consumption_rows(data, actual_only=True) -> Tuple[List[tuple], BCHydroRates]:
+    """Like `parse_consumption_xml()`, but points are ROW_FIELDS tuples.
+
+    Tuples pickle several times faster than point objects, which matters when
+    the result crosses a process boundary.
+    """
+    return _parse_all(data, actual_only, row_from_attrib)
+
+
+async def run_parser(executor, fn, *args):
+    """Run `fn(*args)` on `executor`, or inline when there is none.
+
+    With a process pool, `fn`, its arguments and its result must pickle, so
+    pass module-level functions such as `parse_consumption_xml`.
+    """
+    if executor is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def run_consumption_parser(
+    executor, data
+) -> Tuple[List[BCHydroDailyElectricity], BCHydroRates]:
+    """`parse_consumption_xml()` on `executor`, shipping rows from processes."""
+    # Imported here: concurrent.futures loads multiprocessing for this name
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not isinstance(executor, ProcessPoolExecutor):
+        return await run_parser(executor, parse_consumption_xml, data)
+
+    rows, rates = await run_parser(executor, parse_consumption_rows, data)
+    from_row = BCHydroDailyElectricity.from_row
+    return [from_row(row) for row in rows], rates
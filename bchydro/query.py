@@ -0,0 +1,163 @@
+"""Sorted time index and running aggregates over usage points"""
+
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Tuple, Union
+
+from .delta import start_key, time_key
+from .types import BCHydroAccount, BCHydroDailyElectricity, BCHydroDailyUsage
+
+TimeBound = Union[str, date, datetime]
+
+
+def _bound_key(value: TimeBound) -> Tuple[str, bool]:
+    """Key of a range bound, and whether it names a UTC instant.
+
+    Bounds with a UTC offset compare against the points' UTC starts; dates
+    and naive times against their wall-clock starts.
+    """
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    try:
+        aware = datetime.fromisoformat(value).tzinfo is not None
+    except ValueError:
+        aware = False
+    return time_key(value), aware
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _buckets(key: str) -> Tuple[str, str, int]:
+    """Day, ISO week ("YYYY-Www") and hour of day a wall-clock start falls in."""
+    day = key[:10]
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    hour = int(key[11:13]) if len(key) >= 13 else 0
+    return day, f"{year}-W{week:02d}", hour
+
+
+class BCHydroUsageIndex:
+    def __init__(self, points: Iterable[BCHydroDailyElectricity] = ()):
+        """Usage points kept in start order, with totals maintained on insert.
+
+        Timestamps are parsed once when a point is added. Range lookups bisect
+        the sorted start keys, and the per-day, per-week and per-hour-of-day
+        totals are updated as points are added or replaced, so queries never
+        rescan the points. Points are keyed on their UTC start, so both hours
+        repeated when DST ends are kept; day, week and hour buckets use the
+        portal's local wall-clock time.
+        """
+        self._keys: List[str] = []
+        # Wall-clock starts, in the same order; never decreasing for hourly or
+        # daily points, so naive bounds can bisect them
+        self._walls: List[str] = []
+        self._points: List[BCHydroDailyElectricity] = []
+        self._values: List[Tuple[float, float]] = []
+        # Cumulative (consumption, cost) up to each position, rebuilt lazily
+        # from the first position that changed
+        self._cumulative: List[Tuple[float, float]] = [(0.0, 0.0)]
+        self._valid_to = 0
+        self.daily: Dict[str, List[float]] = {}
+        self.weekly: Dict[str, List[float]] = {}
+        self.hour_of_day: Dict[int, List[float]] = {}
+        self.add(points)
+
+    @classmethod
+    def from_usage(cls, usage: BCHydroDailyUsage) -> "BCHydroUsageIndex":
+        return cls(usage.electricity)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __iter__(self):
+        return iter(self._points)
+
+    def __repr__(self):
+        span = f"{self._walls[0]} to {self._walls[-1]}" if self._walls else "empty"
+        return f"BCHydroUsageIndex({len(self)} points, {span})"
+
+    def _aggregate(self, wall: str, values: Tuple[float, float], sign: int):
+        consumption, cost = values
+        for table, bucket in zip(
+            (self.daily, self.weekly, self.hour_of_day), _buckets(wall)
+        ):
+            totals = table.setdefault(bucket, [0.0, 0.0])
+            totals[0] += sign * consumption
+            totals[1] += sign * cost
+
+    def add(self, points: Iterable[BCHydroDailyElectricity]) -> int:
+        """Insert points, replacing any with the same start; returns the count."""
+        count = 0
+        for point in points:
+            key = start_key(point)
+            wall = point.interval.start[:19]
+            values = (_number(point.consumption), _number(point.cost))
+            position = len(self._keys)
+            # New intervals almost always arrive after the last one
+            if position and key <= self._keys[-1]:
+                position = bisect_left(self._keys, key)
+
+            if position < len(self._keys) and self._keys[position] == key:
+                self._aggregate(self._walls[position], self._values[position], -1)
+                self._walls[position] = wall
+                self._points[position] = point
+                self._values[position] = values
+            else:
+                self._keys.insert(position, key)
+                self._walls.insert(position, wall)
+                self._points.insert(position, point)
+                self._values.insert(position, values)
+
+            self._aggregate(wall, values, 1)
+            self._valid_to = min(self._valid_to, position)
+            count += 1
+        return count
+
+    def _position(self, bound: TimeBound, default: int) -> int:
+        if bound is None:
+            return default
+        key, aware = _bound_key(bound)
+        return bisect_left(self._keys if aware else self._walls, key)
+
+    def _slice(self, start: TimeBound = None, end: TimeBound = None) -> Tuple[int, int]:
+        low = self._position(start, 0)
+        high = self._position(end, len(self._keys))
+        return low, max(low, high)
+
+    def range(
+        self, start: TimeBound = None, end: TimeBound = None
+    ) -> List[BCHydroDailyElectricity]:
+        """Points with `start` <= interval start < `end`, oldest first."""
+        low, high = self._slice(start, end)
+        return self._points[low:high]
+
+    def _cumulative_at(self, position: int) -> Tuple[float, float]:
+        cumulative = self._cumulative
+        valid_to = self._valid_to
+        if valid_to < position:
+            keep = valid_to + 1
+            del cumulative[keep:]
+            consumption, cost = cumulative[-1]
+            for values in self._values[valid_to:]:
+                consumption += values[0]
+                cost += values[1]
+                cumulative.append((consumption, cost))
+            self._valid_to = len(self._values)
+        return cumulative[position]
+
+    def totals(
+        self, start: TimeBound = None, end: TimeBound = None
+    ) -> Tuple[float, float]:
+        """Total (consumption, cost) of the points in a range."""
+        low, high = self._slice(start, end)
+        high_consumption, high_cost = self._cumulative_at(high)
+        low_consumption, low_cost = self._cumulative_at(low)
+        return high_consumption - low_consumption, high_cost - low_cost
+
+    def billing_period_totals(self, account: BCHydroAccount) -> Tuple[float, float]:
+        """Total (consumption, cost) within the account's current billing period."""
+        return self.totals(account.evpBillingStart, account.evpBillingEnd)
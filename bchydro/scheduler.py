@@ -0,0 +1,176 @@
+"""Background polling with shared subscriptions to new usage points"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Set
+
+from .delta import start_key
+from .types import BCHydroDailyElectricity, BCHydroDailyUsage
+from .const import (
+    GRANULARITY_DAILY,
+    GRANULARITY_HOURLY,
+    POLL_INTERVAL,
+    POLL_MIN_INTERVAL,
+    POLL_MAX_INTERVAL,
+    POLL_BACKOFF,
+    POLL_JITTER,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Length of one interval per granularity, used to predict the next publish
+_STEPS = {GRANULARITY_DAILY: timedelta(days=1), GRANULARITY_HOURLY: timedelta(hours=1)}
+
+
+class BCHydroPoller:
+    def __init__(
+        self,
+        api,
+        hourly=False,
+        interval: float = POLL_INTERVAL,
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        backoff: float = POLL_BACKOFF,
+        jitter: float = POLL_JITTER,
+    ):
+        """Poll `api.refresh()` in the background and fan new points out.
+
+        One poll task serves every subscriber and runs only while at least one
+        is attached. The delay starts at `interval` and grows by `backoff` up
+        to `max_interval` while no new interval shows up, resetting once one
+        does. Delays are shortened (down to `min_interval`) so a poll lands
+        when the next interval is expected to be published, judged from the
+        newest interval end and the lag seen so far. Every delay is spread by
+        +/- `jitter` (a fraction) so a fleet of pollers does not synchronize.
+        """
+        self.api = api
+        self.granularity = hourly and GRANULARITY_HOURLY or GRANULARITY_DAILY
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.polls = 0
+        self._delay = interval
+        self._primed = False
+        self._watermark: Optional[str] = None
+        self._newest_end: Optional[datetime] = None
+        self._publish_lag: Optional[timedelta] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: asyncio.Task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stop(self):
+        """Cancel the poll task and end every subscription."""
+        if self._task is not None:
+            self._task.cancel()
+        self._task = None
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self) -> AsyncIterator[BCHydroDailyElectricity]:
+        """Yield ACTUAL points first seen after subscribing, oldest first."""
+        queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+        try:
+            while True:
+                points = await queue.get()
+                if points is None:
+                    # The poller was stopped
+                    return
+                for point in points:
+                    yield point
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers:
+                self.stop()
+
+    async def _run(self):
+        while True:
+            try:
+                moved = await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.warning("Polling %s usage failed: %s", self.granularity, e)
+                moved = False
+            await asyncio.sleep(self.next_delay(moved))
+
+    async def poll(self) -> bool:
+        """Refresh once and publish new points; True if any were found."""
+        # Probing reaches the portal, where the cache could mask new intervals,
+        # but only downloads consumption once something was published
+        usage = await self.api.refresh(
+            hourly=self.granularity == GRANULARITY_HOURLY, probe=True
+        )
+        self.polls += 1
+
+        primed, self._primed = self._primed, True
+        new_points = self._new_points(usage)
+        if not new_points:
+            return False
+
+        self._watermark = start_key(new_points[-1])
+        self._observe_publish(new_points[-1], measure_lag=primed)
+        # The first poll only sets the watermark; subscribers want what's next
+        if primed:
+            for queue in self._subscribers:
+                queue.put_nowait(new_points)
+        return True
+
+    def _new_points(self, usage: BCHydroDailyUsage) -> List[BCHydroDailyElectricity]:
+        points = usage.electricity
+        if self._watermark is None:
+            return list(points)
+        # Points are in time order, so only the tail needs looking at
+        count = 0
+        for point in reversed(points):
+            if start_key(point) <= self._watermark:
+                break
+            count += 1
+        first_new = len(points) - count
+        return points[first_new:]
+
+    def _observe_publish(self, point: BCHydroDailyElectricity, measure_lag=True):
+        try:
+            end = datetime.fromisoformat(point.interval.end)
+        except (TypeError, ValueError):
+            return
+        if end.tzinfo is None:
+            return
+        self._newest_end = end
+        if not measure_lag:
+            # Points already there on the first poll may be long published
+            return
+        lag = datetime.now(timezone.utc) - end
+        if self._publish_lag is None or lag < self._publish_lag:
+            self._publish_lag = lag
+
+    def _until_publish(self) -> Optional[float]:
+        """Seconds until the next interval is expected to appear, if known."""
+        if self._newest_end is None or self._publish_lag is None:
+            return None
+        expected = self._newest_end + _STEPS[self.granularity] + self._publish_lag
+        return (expected - datetime.now(timezone.utc)).total_seconds()
+
+    def next_delay(self, moved: bool) -> float:
+        if moved:
+            self._delay = self.interval
+        else:
+            self._delay = min(self._delay * self.backoff, self.max_interval)
+
+        delay = self._delay
+        until_publish = self._until_publish()
+        # Poll right when the next interval is due, and keep polling quickly
+        # for a while if it is late, before settling back into the backoff
+        if until_publish is not None and -self.max_interval < until_publish < delay:
+            delay = max(until_publish, self.min_interval)
+
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
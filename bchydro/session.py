@@ -0,0 +1,100 @@
+"""Pluggable persistence for logged-in portal sessions"""
+
+import json
+import os
+from email.utils import formatdate
+from http.cookies import Morsel
+from typing import List
+
+from yarl import URL
+
+# Morsel attributes kept when a cookie is saved
+_COOKIE_ATTRIBUTES = ("domain", "path", "expires", "max-age", "secure", "httponly")
+
+
+def dump_cookies(cookie_jar) -> List[dict]:
+    """Serialize an aiohttp cookie jar into JSON-friendly dicts."""
+    cookies = []
+    for morsel in cookie_jar:
+        cookie = {"name": morsel.key, "value": morsel.value}
+        cookie.update({k: morsel[k] for k in _COOKIE_ATTRIBUTES if morsel[k]})
+        cookies.append(cookie)
+    return cookies
+
+
+def load_cookies(cookie_jar, cookies: List[dict]):
+    """Add cookies produced by `dump_cookies()` to an aiohttp cookie jar."""
+    for cookie in cookies:
+        morsel = Morsel()
+        morsel.set(cookie["name"], cookie["value"], cookie["value"])
+        for key in _COOKIE_ATTRIBUTES:
+            if key in cookie:
+                morsel[key] = cookie[key]
+        domain = cookie.get("domain", "").lstrip(".")
+        url = URL.build(scheme="https", host=domain, path=cookie.get("path") or "/")
+        cookie_jar.update_cookies({cookie["name"]: morsel}, response_url=url)
+
+
+def cookies_from_browser(browser_cookies: List[dict]) -> List[dict]:
+    """Convert cookies from a pyppeteer page into the `dump_cookies()` format."""
+    cookies = []
+    for c in browser_cookies:
+        cookie = {"name": c["name"], "value": c["value"]}
+        cookie["domain"] = c.get("domain", "")
+        cookie["path"] = c.get("path", "/")
+        if not c.get("session") and c.get("expires", -1) > 0:
+            cookie["expires"] = formatdate(c["expires"], usegmt=True)
+        if c.get("secure"):
+            cookie["secure"] = True
+        if c.get("httpOnly"):
+            cookie["httponly"] = True
+        cookies.append(cookie)
+    return cookies
+
+
+class BCHydroSessionStore:
+    """Where `BCHydroApi` keeps its session between processes.
+
+    Subclass and implement `load()`, `save()` and `clear()` to keep sessions
+    somewhere other than a local file, e.g. a shared cache for a worker fleet.
+    The state is a JSON-serializable dict holding the username, cookies, the
+    bchydroparam token and the selected account snapshot.
+    """
+
+    def load(self) -> dict:
+        raise NotImplementedError
+
+    def save(self, state: dict):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class BCHydroFileSessionStore(BCHydroSessionStore):
+    def __init__(self, path: str):
+        """Keep the session in a JSON file readable only by the current user.
+
+        The file holds live session cookies; treat it like a password.
+        """
+        self.path = path
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state: dict):
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
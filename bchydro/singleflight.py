@@ -0,0 +1,32 @@
+"""In-flight call deduplication"""
+
+import asyncio
+
+
+class BCHydroSingleFlight:
+    def __init__(self):
+        """Coalesce concurrent calls that share a key into one shared future.
+
+        The first caller for a key starts the work; callers arriving while it
+        is running await the same result (or exception) instead of starting
+        their own. Cancelling one waiter does not cancel the shared call.
+        """
+        self._calls = {}
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,106 @@
+"""Persistent interval store backed by SQLite"""
+
+import sqlite3
+from typing import Iterable, List
+
+from .delta import time_key
+from .types import ROW_FIELDS, BCHydroDailyElectricity
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intervals (
+    account TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    start_key TEXT NOT NULL,
+    start TEXT,
+    end TEXT,
+    type TEXT,
+    quality TEXT,
+    consumption TEXT,
+    cost TEXT,
+    PRIMARY KEY (account, granularity, start_key)
+)
+"""
+
+_COLUMNS = ", ".join(ROW_FIELDS)
+
+
+class BCHydroIntervalStore:
+    def __init__(self, path: str = ":memory:"):
+        """Usage intervals keyed by account, granularity and interval start.
+
+        Values are stored exactly as the portal reports them, so points read
+        back compare equal to freshly parsed ones.
+        """
+        self.path = path
+        # The store is only touched from the event loop thread, which may not
+        # be the thread that created it (see the sync client).
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def upsert(
+        self, account: str, granularity: str, points: Iterable[BCHydroDailyElectricity]
+    ) -> int:
+        rows = [
+            (
+                account,
+                granularity,
+                time_key(p.interval.start),
+                p.interval.start,
+                p.interval.end,
+                p.type,
+                p.quality,
+                p.consumption,
+                p.cost,
+            )
+            for p in points
+        ]
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO intervals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def newest_actual(
+        self, account: str, granularity: str, since: str = None
+    ) -> BCHydroDailyElectricity:
+        """Latest stored ACTUAL point, optionally starting no earlier than `since`."""
+        query = (
+            f"SELECT {_COLUMNS} FROM intervals"
+            " WHERE account = ? AND granularity = ? AND quality = 'ACTUAL'"
+        )
+        params = [account, granularity]
+        if since is not None:
+            query += " AND start_key >= ?"
+            params.append(time_key(since))
+        query += " ORDER BY start_key DESC LIMIT 1"
+        row = self._db.execute(query, params).fetchone()
+        return BCHydroDailyElectricity.from_row(row) if row else None
+
+    def points(
+        self, account: str, granularity: str, start: str = None, end: str = None
+    ) -> List[BCHydroDailyElectricity]:
+        """Stored points with `start` <= interval start < `end`, oldest first."""
+        query = (
+            f"SELECT {_COLUMNS} FROM intervals WHERE account = ? AND granularity = ?"
+        )
+        params = [account, granularity]
+        if start is not None:
+            query += " AND start_key >= ?"
+            params.append(time_key(start))
+        if end is not None:
+            query += " AND start_key < ?"
+            params.append(time_key(end))
+        query += " ORDER BY start_key"
+        rows = self._db.execute(query, params)
+        return [BCHydroDailyElectricity.from_row(row) for row in rows]
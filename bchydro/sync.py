@@ -0,0 +1,113 @@
+"""Blocking client running BCHydroApi on a background event loop"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import List
+
+from .api import BCHydroApi
+from .delta import BCHydroUsageDelta
+from .types import (
+    BCHydroDailyElectricity,
+    BCHydroDailyUsage,
+    BCHydroInterval,
+)
+
+
+class BCHydroSyncApi:
+    def __init__(self, username, password, timeout: float = None, **kwargs):
+        """Synchronous wrapper for BCHydroApi, safe to share between threads.
+
+        A daemon thread runs one event loop for the life of the client, and a
+        single `BCHydroApi` lives on it, so the HTTP session, cookies and
+        caches are reused by every call instead of being rebuilt by
+        `asyncio.run()`. Calls block the calling thread until the result is
+        ready, or cancel the call and raise `concurrent.futures.TimeoutError`
+        after `timeout` seconds. Other keyword arguments are passed to
+        `BCHydroApi`.
+        """
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="bchydro-loop", daemon=True
+        )
+        self._thread.start()
+        try:
+            self.api: BCHydroApi = self._run(
+                self._create_api(username, password, kwargs)
+            )
+        except BaseException:
+            self._stop_loop()
+            raise
+
+    @staticmethod
+    async def _create_api(username, password, kwargs) -> BCHydroApi:
+        # Built on the loop thread so anything it binds belongs to that loop
+        return BCHydroApi(username, password, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self, coro):
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("BCHydroSyncApi called from its own event loop")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            # Otherwise the call would carry on, and change state, unobserved
+            future.cancel()
+            raise
+
+    def call(self, method: str, *args, **kwargs):
+        """Run any `BCHydroApi` coroutine method by name and return its result."""
+        return self._run(getattr(self.api, method)(*args, **kwargs))
+
+    def close(self):
+        """Close the HTTP session, then stop and join the loop thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            self._run(self.api.close())
+        finally:
+            self._stop_loop()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def refresh(self, hourly=False, probe=False) -> BCHydroDailyUsage:
+        return self._run(self.api.refresh(hourly=hourly, probe=probe))
+
+    def refresh_delta(self, hourly=False, probe=False) -> BCHydroUsageDelta:
+        return self._run(self.api.refresh_delta(hourly=hourly, probe=probe))
+
+    def get_usage(self, hourly=False) -> BCHydroDailyUsage:
+        return self._run(self.api.get_usage(hourly=hourly))
+
+    def get_latest_point(self) -> BCHydroDailyElectricity:
+        return self._run(self.api.get_latest_point())
+
+    def get_latest_interval(self) -> BCHydroInterval:
+        return self._run(self.api.get_latest_interval())
+
+    def get_latest_usage(self):
+        return self._run(self.api.get_latest_usage())
+
+    def get_latest_cost(self):
+        return self._run(self.api.get_latest_cost())
+
+    def list_accounts(self) -> List[dict]:
+        return self._run(self.api.list_accounts())
+
+    def fetch_range(self, start, end, hourly=False, account_id=None, use_cache=True):
+        return self._run(
+            self.api.fetch_range(
+                start, end, hourly=hourly, account_id=account_id, use_cache=use_cache
+            )
+        )
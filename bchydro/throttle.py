@@ -0,0 +1,65 @@
+"""Awaitable token-bucket rate limiting"""
+
+import asyncio
+import threading
+import time
+
+from .const import (
+    LOGIN_RATE_CALLS,
+    LOGIN_RATE_PERIOD,
+    DATA_RATE_CALLS,
+    DATA_RATE_PERIOD,
+)
+
+
+class BCHydroRateLimiter:
+    def __init__(self, calls: int, period: float):
+        """Token bucket allowing bursts of `calls`, refilled at `calls / period`.
+
+        `acquire()` waits for a slot rather than raising. Slots are reserved
+        up front, so waiters are served in arrival order. The limiter holds no
+        event-loop state and may be shared by clients on any loop or thread.
+        """
+        self.capacity = calls
+        self.rate = calls / period
+        self.waited = 0.0
+        self._tokens = float(calls)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def _refund(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    async def acquire(self) -> float:
+        """Wait for a slot, returning how many seconds were spent waiting."""
+        delay = self._reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._refund()
+                raise
+            self.waited += delay
+        return delay
+
+
+# Process-wide defaults, shared by every BCHydroApi not given its own limiter
+login_limiter = BCHydroRateLimiter(LOGIN_RATE_CALLS, LOGIN_RATE_PERIOD)
+data_limiter = BCHydroRateLimiter(DATA_RATE_CALLS, DATA_RATE_PERIOD)
@@ -27,6 +27,11 @@ class BCHydroInterval:
         return f"BCHydroInterval('{self.start}', '{self.end}')"
 
 
+# Field order of the plain tuples that stand in for points where objects
+# would cost too much: SQLite rows, exports, frames and process-pool results
+ROW_FIELDS = ("start", "end", "type", "quality", "consumption", "cost")
+
+
 class BCHydroDailyElectricity:
     def __init__(
         self,
@@ -42,6 +47,24 @@ class BCHydroDailyElectricity:
         self.interval = interval
         self.cost = cost
 
+    def to_row(self) -> tuple:
+        """The point as a tuple laid out as ROW_FIELDS."""
+        interval = self.interval
+        return (
+            interval.start,
+            interval.end,
+            self.type,
+            self.quality,
+            self.consumption,
+            self.cost,
+        )
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "BCHydroDailyElectricity":
+        """Build from a tuple laid out as ROW_FIELDS."""
+        start, end, type, quality, consumption, cost = row
+        return cls(type, quality, consumption, BCHydroInterval(start, end), cost)
+
     def __repr__(self):
         return f"BCHydroDailyElectricity('{self.type}', '{self.quality}', {self.consumption}, {self.interval}, {self.cost})"
 
@@ -79,6 +102,29 @@ class BCHydroAccount:
         self.evpEstCostCurPeriod = evpEstCostCurPeriod
         self.evpCurrentDateTime = evpCurrentDateTime
 
+    def update(self, other: "BCHydroAccount"):
+        """Copy every field from a newer response for the same account."""
+        vars(self).update(vars(other))
+
+    @classmethod
+    def from_json(cls, json_res: dict) -> "BCHydroAccount":
+        """Build from the URL_GET_ACCOUNT_JSON response."""
+        return cls(
+            json_res["evpSlid"],
+            json_res["evpAccount"],
+            json_res["evpAccountId"],
+            json_res["evpProfileId"],
+            json_res["evpRateGroup"],
+            json_res["evpBillingStart"],
+            json_res["evpBillingEnd"],
+            json_res["evpConsToDate"],
+            json_res["evpCostToDate"],
+            json_res["yesterdayPercentage"],
+            json_res["evpEstConsCurPeriod"],
+            json_res["evpEstCostCurPeriod"],
+            json_res["evpCurrentDateTime"],
+        )
+
 
 class BCHydroDailyUsage:
     def __init__(
@@ -90,3 +136,9 @@ class BCHydroDailyUsage:
         self.electricity = electricity
         self.rates = rates
         self.account = account
+
+    def to_frame(self):
+        """Columnar NumPy view of `electricity`; requires the numpy extra."""
+        from .frame import BCHydroUsageFrame
+
+        return BCHydroUsageFrame.from_points(self.electricity)
@@ -0,0 +1,55 @@
+"""Compare the single-pass login page scanner against BeautifulSoup.
+
+Runs both paths over the saved portal pages in benchmarks/fixtures, checks
+they agree, and prints time per page and the speed-up.
+
+    python benchmarks/bench_html_scan.py --runs 50
+"""
+
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bchydro.htmlscan import _fast_scan, _soup_scan  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "*.html")
+
+
+def as_tuple(page):
+    return (page.bchydroparam, page.has_account_list, page.alert_errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+
+        fast = _fast_scan(html)
+        if fast is None or as_tuple(fast) != as_tuple(_soup_scan(html)):
+            print(f"{os.path.basename(path)}: fast path disagrees with BeautifulSoup")
+            sys.exit(1)
+
+        fast_s = min(
+            timeit.repeat(lambda: _fast_scan(html), number=1, repeat=args.runs)
+        )
+        soup_s = min(
+            timeit.repeat(lambda: _soup_scan(html), number=1, repeat=args.runs)
+        )
+        print(
+            f"{os.path.basename(path):20s} {len(html) // 1024:4d} KiB"
+            f"  fast {fast_s * 1000:7.2f} ms  soup {soup_s * 1000:7.2f} ms"
+            f"  x{soup_s / fast_s:5.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure how long `import bchydro` takes in a fresh interpreter.
+
+Each statement runs in its own subprocess so nothing is cached between runs.
+Exits non-zero if `import bchydro` is slower than --max-ms or loads any of the
+heavy optional dependencies, so it can guard cron/CLI start-up time in CI.
+
+    python benchmarks/bench_import.py --runs 20 --max-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = (
+    "import bchydro",
+    "from bchydro import BCHydroApi",
+    "from bchydro import BCHydroApiSimple",
+)
+
+# Modules that a bare `import bchydro` must not drag in
+HEAVY_MODULES = ("aiohttp", "bs4", "pyppeteer", "tenacity", "ratelimit", "numpy")
+
+
+def time_statement(statement, runs):
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            env=dict(os.environ, PYTHONPATH=ROOT),
+        )
+        samples.append(float(output) * 1000)
+    return samples
+
+
+def loaded_heavy_modules():
+    code = (
+        "import sys, bchydro; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", code], cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT)
+    )
+    return [m for m in output.decode().strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    failed = False
+    for statement in STATEMENTS:
+        try:
+            samples = time_statement(statement, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{statement:40s} failed (missing dependency?)")
+            continue
+        median = statistics.median(samples)
+        print(f"{statement:40s} median {median:7.1f} ms  min {min(samples):7.1f} ms")
+        if statement == "import bchydro" and args.max_ms and median > args.max_ms:
+            print(f"  slower than --max-ms {args.max_ms}")
+            failed = True
+
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print("import bchydro loaded heavy modules:", ", ".join(heavy))
+        failed = True
+
+    print(f"done in {time.perf_counter() - start:.1f} s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
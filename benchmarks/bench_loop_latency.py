@@ -0,0 +1,107 @@
+"""Measure event-loop stalls while many clients refresh large hourly payloads.
+
+Runs the offline portal stand-in (benchmarks/portal.py) and several
+BCHydroApi clients refreshing concurrently, parsing inline, on a thread pool
+and on a process pool. A ticker coroutine sleeping 1 ms records how late the
+loop wakes it up; long parses on the loop show up as large lags.
+
+    python benchmarks/bench_loop_latency.py --clients 8 --hourly-points 20000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+import portal  # noqa: E402
+
+TICK = 0.001
+
+
+async def ticker(lags, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def measure(args, executor):
+    # Imported only now so that BCHYDRO_BASE_URL is already set
+    from bchydro.api import BCHydroApi
+    from bchydro.throttle import BCHydroRateLimiter
+
+    unlimited = BCHydroRateLimiter(10**6, 1)
+    clients = [
+        BCHydroApi(
+            "user",
+            "pass",
+            cache_ttl=0,
+            login_limiter=unlimited,
+            data_limiter=unlimited,
+            parse_executor=executor,
+        )
+        for _ in range(args.clients)
+    ]
+    # Log in before measuring so only refreshes are timed
+    await asyncio.gather(*(c.refresh(hourly=True) for c in clients))
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.ensure_future(ticker(lags, stop))
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(c.refresh(hourly=True) for c in clients))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+
+    for client in clients:
+        await client.close()
+    return lags, elapsed
+
+
+async def main(args):
+    stand_in = portal.Portal(hourly_points=args.hourly_points)
+    runner = await portal.start(stand_in, port=args.port)
+    modes = (
+        ("inline", lambda: None),
+        ("threads", lambda: ThreadPoolExecutor(args.workers)),
+        ("processes", lambda: ProcessPoolExecutor(args.workers)),
+    )
+    try:
+        for name, make_executor in modes:
+            executor = make_executor()
+            try:
+                lags, elapsed = await measure(args, executor)
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+            lags.sort()
+            p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+            print(
+                f"{name:10s} lag median {statistics.median(lags):7.2f} ms"
+                f"  p99 {p99:7.2f} ms  max {lags[-1]:7.2f} ms"
+                f"  wall {elapsed:6.2f} s"
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hourly-points", type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ["BCHYDRO_BASE_URL"] = f"http://localhost:{args.port}"
+    asyncio.run(main(args))
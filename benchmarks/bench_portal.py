@@ -0,0 +1,104 @@
+"""Benchmark the HTTP client end to end against the offline portal stand-in.
+
+Starts benchmarks/portal.py in-process and points BCHydroApi at it through
+BCHYDRO_BASE_URL. Reports cold login and warm refresh times, XML parse
+throughput and peak traced memory for daily and hourly payloads.
+
+    python benchmarks/bench_portal.py --runs 10 --hourly-points 8760
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+import portal  # noqa: E402
+
+
+def report(label, samples, unit="ms"):
+    print(
+        f"{label:28s} min {min(samples):9.2f} {unit}"
+        f"  median {statistics.median(samples):9.2f} {unit}"
+    )
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(args, stand_in):
+    # Imported only now so that BCHYDRO_BASE_URL is already set
+    from bchydro.api import BCHydroApi
+    from bchydro.parsing import parse_consumption_xml
+    from bchydro.throttle import BCHydroRateLimiter
+
+    def client():
+        # The stand-in has no rate limits; don't let the shared ones skew timings
+        unlimited = BCHydroRateLimiter(10**6, 1)
+        return BCHydroApi(
+            "user", "pass", cache_ttl=0, login_limiter=unlimited, data_limiter=unlimited
+        )
+
+    cold = []
+    for _ in range(args.runs):
+        async with client() as api:
+            cold.append(await timed(api._ensure_authenticated()))
+    report("cold login", cold)
+
+    async with client() as api:
+        for hourly, points in ((False, args.daily_points), (True, args.hourly_points)):
+            name = "hourly" if hourly else "daily"
+            usage = await api.refresh(hourly=hourly)
+            if len(usage.electricity) != points - 2:
+                sys.exit(f"{name}: expected {points - 2} ACTUAL points")
+
+            warm = [await timed(api.refresh(hourly=hourly)) for _ in range(args.runs)]
+            report(f"warm refresh {name} ({points})", warm)
+
+            tracemalloc.start()
+            await api.refresh(hourly=hourly)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{'peak memory ' + name:28s} {peak / 1024:9.1f} KiB")
+
+            xml = stand_in._xml[name]
+            parse_s = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                parse_consumption_xml(xml)
+                parse_s.append(time.perf_counter() - start)
+            rates = [points / s for s in parse_s]
+            print(
+                f"{'parse ' + name:28s} {max(rates):12,.0f} points/s"
+                f"  ({len(xml) // 1024} KiB)"
+            )
+
+
+async def main(args):
+    stand_in = portal.Portal(args.daily_points, args.hourly_points)
+    runner = await portal.start(stand_in, port=args.port)
+    try:
+        await run(args, stand_in)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--daily-points", type=int, default=31)
+    parser.add_argument("--hourly-points", type=int, default=744)
+    args = parser.parse_args()
+
+    os.environ["BCHYDRO_BASE_URL"] = f"http://localhost:{args.port}"
+    asyncio.run(main(args))
@@ -0,0 +1,214 @@
+"""Offline stand-in for the BC Hydro portal.
+
+Serves the recorded login pages in benchmarks/fixtures, the account JSON and
+generated consumption XML of a configurable size, so the HTTP client can be
+exercised without network access. Point the client at it with
+BCHYDRO_BASE_URL before `bchydro` is imported:
+
+    python benchmarks/portal.py --port 8765 --daily-points 31 --hourly-points 744
+    BCH_USER=user BCH_PASS=pass BCHYDRO_BASE_URL=http://localhost:8765 python test.py
+
+Use `localhost` rather than an IP address: aiohttp's cookie jar ignores
+cookies from IP hosts.
+"""
+
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+BILLING_START = datetime(2020, 6, 1)
+UTC_OFFSET = "-07:00"
+
+SESSION_COOKIE = "bchydro_session"
+
+ACCOUNTS = ("000000000003", "000000000005")
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def consumption_xml(points: int, hourly: bool, estimated: int = 2) -> str:
+    """Consumption XML with `points` intervals, the last `estimated` of them ESTIMATED."""
+    step = timedelta(hours=1) if hourly else timedelta(days=1)
+    point = (
+        '<Point type="CONSUMPTION" quality="{quality}" dateTime="{start}{tz}"'
+        ' endTime="{end}{tz}" value="{value:.2f}" cost="{cost:.2f}"/>'
+    )
+    rows = []
+    for i in range(points):
+        start = BILLING_START + i * step
+        rows.append(
+            point.format(
+                quality="ESTIMATED" if i >= points - estimated else "ACTUAL",
+                start=start.isoformat(),
+                end=(start + step).isoformat(),
+                tz=UTC_OFFSET,
+                value=1 + i % 7,
+                cost=0.1 * (1 + i % 7),
+            )
+        )
+    rates = (
+        '<Rates daysSince="5" cons2date="120.5" cost2date="14.46"'
+        ' estCons="600" estCost="72"/>'
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><Consumption>'
+        f'<Series>{"".join(rows)}</Series>{rates}</Consumption>'
+    )
+
+
+class Portal:
+    def __init__(
+        self,
+        daily_points=31,
+        hourly_points=744,
+        multi_account=False,
+        session_ttl: float = None,
+    ):
+        """Portal routes and counters; payloads are built once up front.
+
+        Sessions expire `session_ttl` seconds after login, if given.
+        """
+        self.multi_account = multi_account
+        self.session_ttl = session_ttl
+        # Session id to the monotonic time of its login
+        self.sessions = {}
+        self.selected = ACCOUNTS[0]
+        self.requests = dict.fromkeys(
+            ("login", "login_page", "accounts", "overview", "global", "data"), 0
+        )
+        self._login_html = _fixture("overview.html")
+        self._account_list_html = _fixture("account_list.html")
+        self.publish(daily_points, hourly_points)
+
+    def publish(self, daily_points: int, hourly_points: int):
+        """Replace the consumption payloads, as when new intervals are published.
+
+        The account JSON's data timestamp moves with them, as on the portal.
+        """
+        self._xml = {
+            "daily": consumption_xml(daily_points, hourly=False).encode(),
+            "hourly": consumption_xml(hourly_points, hourly=True).encode(),
+        }
+        self.data_time = BILLING_START + max(
+            timedelta(days=daily_points), timedelta(hours=hourly_points)
+        )
+        self.consumption_to_date = 1.5 * daily_points
+
+    def expire_sessions(self):
+        """Forget every session, as the portal does when it logs users out."""
+        self.sessions.clear()
+
+    def _logged_in(self, request) -> bool:
+        logged_in_at = self.sessions.get(request.cookies.get(SESSION_COOKIE))
+        if logged_in_at is None:
+            return False
+        return self.session_ttl is None or (
+            time.monotonic() - logged_in_at < self.session_ttl
+        )
+
+    def _to_login_page(self):
+        return web.HTTPFound("/BCHCustomerPortal/web/login.html")
+
+    async def login(self, request):
+        self.requests["login"] += 1
+        await request.post()
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = time.monotonic()
+        self.selected = ACCOUNTS[0]
+        page = self._account_list_html if self.multi_account else self._login_html
+        response = web.Response(text=page, content_type="text/html")
+        response.set_cookie(SESSION_COOKIE, session_id)
+        return response
+
+    async def login_page(self, request):
+        self.requests["login_page"] += 1
+        return web.Response(text="<html><body>Log in</body></html>")
+
+    async def accounts(self, request):
+        self.requests["accounts"] += 1
+        return web.json_response({"accounts": [{"accountId": a} for a in ACCOUNTS]})
+
+    async def overview(self, request):
+        self.requests["overview"] += 1
+        if not self._logged_in(request):
+            raise self._to_login_page()
+        self.selected = request.query["aid"]
+        return web.Response(text=self._login_html, content_type="text/html")
+
+    async def global_data(self, request):
+        self.requests["global"] += 1
+        if not self._logged_in(request):
+            raise self._to_login_page()
+        account = self.selected
+        billing_end = BILLING_START + timedelta(days=31)
+        return web.json_response(
+            {
+                "evpSlid": "1" + account,
+                "evpAccount": "2" + account,
+                "evpAccountId": account,
+                "evpProfileId": "4",
+                "evpRateGroup": "RES1",
+                "evpBillingStart": BILLING_START.isoformat() + UTC_OFFSET,
+                "evpBillingEnd": billing_end.isoformat() + UTC_OFFSET,
+                "evpConsToDate": f"{self.consumption_to_date:.2f}",
+                "evpCostToDate": f"{self.consumption_to_date * 0.12:.2f}",
+                "yesterdayPercentage": "3",
+                "evpEstConsCurPeriod": "600",
+                "evpEstCostCurPeriod": "72",
+                "evpCurrentDateTime": self.data_time.isoformat() + UTC_OFFSET,
+            }
+        )
+
+    async def consumption(self, request):
+        self.requests["data"] += 1
+        form = await request.post()
+        if not self._logged_in(request):
+            raise self._to_login_page()
+        body = self._xml.get(form.get("Granularity"), self._xml["daily"])
+        return web.Response(body=body, content_type="application/xml")
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/sso/UI/Login", self.login)
+        app.router.add_get("/BCHCustomerPortal/web/login.html", self.login_page)
+        app.router.add_post("/BCHCustomerPortal/web/getAccounts.html", self.accounts)
+        app.router.add_get(
+            "/BCHCustomerPortal/web/accountsOverview.html", self.overview
+        )
+        app.router.add_get("/evportlet/web/global-data.html", self.global_data)
+        app.router.add_post("/evportlet/web/consumption-data.html", self.consumption)
+        return app
+
+
+async def start(portal: Portal, host="localhost", port=8765) -> web.AppRunner:
+    """Serve `portal` in the running loop; call `cleanup()` on the result."""
+    runner = web.AppRunner(portal.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--daily-points", type=int, default=31)
+    parser.add_argument("--hourly-points", type=int, default=744)
+    parser.add_argument("--multi-account", action="store_true")
+    args = parser.parse_args()
+
+    portal = Portal(args.daily_points, args.hourly_points, args.multi_account)
+    web.run_app(portal.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,10 +29,15 @@ setup(
         "aiohttp<3.7.5",
         "beautifulsoup4<=4.9.3",
         "tenacity<=6.3.1",
-        "ratelimit<=2.2.1",
         "pyppeteer<=1.0.2",
     ],
     extras_require={
+        "numpy": [
+            "numpy",
+        ],
+        "parquet": [
+            "pyarrow",
+        ],
         "dev": [
             "pip-tools<=7.4.1",
         ],
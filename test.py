@@ -1,7 +1,11 @@
 import os
+import sys
 import asyncio
+import logging
 from bchydro import BCHydroApi
 
+logging.basicConfig(level=logging.DEBUG if "--debug" in sys.argv else logging.INFO)
+
 
 async def main():
     a = BCHydroApi(os.environ.get("BCH_USER"), os.environ.get("BCH_PASS"), cache_ttl=10)
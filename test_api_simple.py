@@ -6,9 +6,12 @@ from bchydro import BCHydroApiSimple
 from bchydro.const import ENUM_LAST_7_DAYS
 
 
-async def main(bep=None):
+async def main(bep=None, debug=False):
     client = BCHydroApiSimple(
-        os.environ.get("BCH_USER"), os.environ.get("BCH_PASS"), browser_exec_path=bep
+        os.environ.get("BCH_USER"),
+        os.environ.get("BCH_PASS"),
+        browser_exec_path=bep,
+        debug=debug,
     )
     usage = await client.get_usage_table(period=ENUM_LAST_7_DAYS)
 
@@ -18,6 +21,9 @@ async def main(bep=None):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="BCHydro API")
     parser.add_argument("--bep", help="Path to browser executable path")
+    parser.add_argument(
+        "--debug", action="store_true", help="Save screenshots and table.html"
+    )
     args = parser.parse_args()
 
-    asyncio.get_event_loop().run_until_complete(main(bep=args.bep))
+    asyncio.get_event_loop().run_until_complete(main(bep=args.bep, debug=args.debug))